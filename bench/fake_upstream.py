@@ -0,0 +1,198 @@
+"""A local stand-in for the Hypixel and Mojang APIs, for benchmarking HypiLite offline.
+
+Serves realistic /v2/player, /v2/guild and Mojang profile payloads with a
+configurable latency and error rate, and counts every call it receives.
+
+Usage:
+    python bench/fake_upstream.py --port 9001 --latency 50 --jitter 20 --error-rate 0.01
+
+Point HypiLite at it with HYPILITE_HYPIXEL_API_URL, HYPILITE_MOJANG_API_URL and
+HYPILITE_MOJANG_SESSION_URL set to ``http://127.0.0.1:<port>``.
+
+GET /_calls returns the call counters and POST /_reset clears them.
+"""
+import argparse
+import asyncio
+import collections
+import functools
+import json
+import random
+from aiohttp import web
+
+# Modes and counters present in real Bedwars stats, by Hypixel stat prefix
+BEDWARS_PREFIXES = (
+    "", "eight_one_", "eight_two_", "four_three_", "four_four_", "two_four_", "four_four_armed_", "castle_",
+    "four_four_lucky_", "eight_two_lucky_", "eight_two_rush_", "four_four_rush_", "eight_two_swap_",
+    "four_four_swap_", "eight_two_ultimate_", "four_four_ultimate_", "four_four_underworld_", "four_four_voidless_",
+)
+BEDWARS_COUNTERS = (
+    "wins", "losses", "final_kills", "final_deaths", "kills", "deaths", "beds_broken", "beds_lost", "games_played",
+    "winstreak", "emerald_resources_collected", "diamond_resources_collected", "gold_resources_collected",
+    "iron_resources_collected", "resources_collected", "void_kills", "void_deaths", "fall_kills", "fall_deaths",
+)
+GUILD_ID = "6647bd04c8f8e3bc1ab7e4c5"
+GUILD_SIZE = 125
+
+
+def uuid_for(number: int) -> str:
+    return f"{number:032x}"
+
+
+def name_for(uuid: str) -> str:
+    return "player_" + uuid[-6:]
+
+
+@functools.lru_cache(maxsize=None)
+def player_body(uuid: str) -> bytes:
+    """The serialized document, generated once so the fake stays cheap next to HypiLite."""
+    return json.dumps(player_document(uuid)).encode()
+
+
+def player_document(uuid: str) -> dict:
+    """A /v2/player response about the size and shape of a real, active player's."""
+    rng = random.Random(uuid)
+    bedwars = {
+        "Experience": rng.randint(0, 5_000_000),
+        "coins": rng.randint(0, 2_000_000),
+        "slumber": {"bag_type": "PLATINUM_MEMBERSHIP_WALLET", "tickets": rng.randint(0, 10_000), "total_tickets_earned": rng.randint(0, 100_000)},
+    }
+    for prefix in BEDWARS_PREFIXES:
+        for counter in BEDWARS_COUNTERS:
+            if rng.random() < 0.85:
+                bedwars[f"{prefix}{counter}_bedwars"] = rng.randint(0, 20_000)
+    bedwars.update({f"shop_item_{i}": rng.randint(0, 100) for i in range(300)})
+
+    return {
+        "success": True,
+        "player": {
+            "uuid": uuid,
+            "displayname": name_for(uuid),
+            "newPackageRank": "MVP_PLUS",
+            "monthlyPackageRank": rng.choice(("NONE", "SUPERSTAR")),
+            "firstLogin": 1591626420000,
+            "lastLogin": 1732925161165,
+            "lastLogout": 1732925713703,
+            "networkExp": rng.randint(0, 50_000_000),
+            "karma": rng.randint(0, 5_000_000),
+            "achievementPoints": rng.randint(0, 10_000),
+            "totalRewards": rng.randint(0, 500),
+            "totalDailyRewards": rng.randint(0, 500),
+            "rewardStreak": rng.randint(0, 50),
+            "rewardScore": rng.randint(0, 50),
+            "rewardHighScore": rng.randint(0, 50),
+            "mostRecentGameType": "BEDWARS",
+            "achievements": {f"general_achievement_{i}": rng.randint(0, 1000) for i in range(1500)},
+            "achievementsOneTime": [f"general_one_time_{i}" for i in range(800)],
+            "stats": {
+                "Bedwars": bedwars,
+                "SkyWars": {f"skywars_stat_{i}": rng.randint(0, 10_000) for i in range(1500)},
+                "Duels": {f"duels_stat_{i}": rng.randint(0, 10_000) for i in range(800)},
+            },
+        },
+    }
+
+
+def guild_document() -> dict:
+    return {
+        "success": True,
+        "guild": {
+            "_id": GUILD_ID,
+            "name": "BenchGuild",
+            "tag": "BENCH",
+            "tagColor": "GOLD",
+            "exp": 19606242,
+            "created": 1715983620704,
+            "members": [
+                {
+                    "uuid": uuid_for(i),
+                    "rank": "Member",
+                    "joined": 1719092290705 + i,
+                    "questParticipation": i,
+                    "expHistory": {f"2024-06-{day:02}": i * day for day in range(1, 8)},
+                }
+                for i in range(1, GUILD_SIZE + 1)
+            ],
+        },
+    }
+
+
+class FakeUpstream:
+    def __init__(self, latency: float, jitter: float, error_rate: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = collections.Counter()
+        self.guild_body = guild_document()
+
+    async def _respond(self, kind: str) -> bool:
+        """Count the call and wait out its latency; False if it should fail."""
+        self.calls[kind] += 1
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            self.calls[f"{kind}_errors"] += 1
+            return False
+        return True
+
+    async def player(self, request: web.Request) -> web.Response:
+        if not await self._respond("hypixel_player"):
+            return web.json_response({"success": False, "cause": "Internal error"}, status=500)
+        return web.Response(body=player_body(request.query["uuid"].replace("-", "")), content_type="application/json")
+
+    async def guild(self, request: web.Request) -> web.Response:
+        if not await self._respond("hypixel_guild"):
+            return web.json_response({"success": False, "cause": "Internal error"}, status=500)
+        return web.json_response(self.guild_body)
+
+    async def session_profile(self, request: web.Request) -> web.Response:
+        if not await self._respond("mojang_session"):
+            return web.Response(status=503)
+        uuid = request.match_info["uuid"].replace("-", "")
+        return web.json_response({"id": uuid, "name": name_for(uuid)})
+
+    async def profile_by_name(self, request: web.Request) -> web.Response:
+        if not await self._respond("mojang_name"):
+            return web.Response(status=503)
+        name = request.match_info["name"]
+        return web.json_response({"id": uuid_for(int(name.rsplit("_", 1)[-1], 16)), "name": name})
+
+    async def profiles_bulk(self, request: web.Request) -> web.Response:
+        if not await self._respond("mojang_bulk"):
+            return web.Response(status=503)
+        names = await request.json()
+        return web.json_response([{"id": uuid_for(int(name.rsplit("_", 1)[-1], 16)), "name": name} for name in names])
+
+    async def get_calls(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.calls))
+
+    async def reset(self, request: web.Request) -> web.Response:
+        self.calls.clear()
+        return web.json_response({})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get("/v2/player", self.player),
+            web.get("/v2/guild", self.guild),
+            web.get("/session/minecraft/profile/{uuid}", self.session_profile),
+            web.get("/users/profiles/minecraft/{name}", self.profile_by_name),
+            web.post("/profiles/minecraft", self.profiles_bulk),
+            web.get("/_calls", self.get_calls),
+            web.post("/_reset", self.reset),
+        ])
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", type=float, default=50, help="Milliseconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0, help="Random +/- milliseconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of calls answered with a 5xx")
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(args.latency / 1000, args.jitter / 1000, args.error_rate)
+    web.run_app(upstream.app(), host="127.0.0.1", port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
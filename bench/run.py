@@ -0,0 +1,204 @@
+"""Benchmark HypiLite against the local fake upstream.
+
+Starts bench/fake_upstream.py and a fresh HypiLite server for every endpoint,
+drives the endpoint at a fixed concurrency for a fixed time, and reports
+requests per second, latency percentiles and the upstream calls it caused.
+Results are also saved as JSON so runs can be compared.
+
+Usage:
+    python bench/run.py --concurrency 50 --duration 10 --latency 50 --players 500
+    python bench/run.py --endpoints bedwars,guild --output bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterator, List
+import aiohttp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, BENCH_DIR)
+
+from fake_upstream import GUILD_SIZE, name_for, uuid_for  # noqa: E402
+
+API_KEY = "bench"
+
+# Path of the n-th request to each endpoint; players are cycled through in order
+ENDPOINTS: Dict[str, Callable[[str], str]] = {
+    "profile": lambda uuid: f"/api/profile/{uuid}?api_key={API_KEY}",
+    "bedwars": lambda uuid: f"/api/bedwars/{uuid}?api_key={API_KEY}",
+    "guild": lambda uuid: f"/api/guild/{uuid}?api_key={API_KEY}",
+    "uuid": lambda uuid: f"/api/uuid/{name_for(uuid)}",
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def wait_until_up(url: str, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async def ping():
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(url) as resp:
+                        return resp.status
+            if asyncio.run(ping()) < 500:
+                return
+        except aiohttp.ClientError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout} seconds")
+
+
+@contextlib.contextmanager
+def process(args: List[str], url: str, env: Dict[str, str] = None, cwd: str = None) -> Iterator[subprocess.Popen]:
+    proc = subprocess.Popen(args, env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(url)
+        yield proc
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def app_env(upstream_url: str, args: argparse.Namespace) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "HYPILITE_HYPIXEL_API_URL": upstream_url,
+        "HYPILITE_MOJANG_API_URL": upstream_url,
+        "HYPILITE_MOJANG_SESSION_URL": upstream_url,
+        # The fake upstream has no quota; keep the governor out of the measurement
+        "HYPILITE_HYPIXEL_RATE_LIMIT": "1000000000",
+    })
+    if args.cache_ttl is not None:
+        env["HYPILITE_PLAYER_CACHE_TTL"] = str(args.cache_ttl)
+        env["HYPILITE_GUILD_CACHE_TTL"] = str(args.cache_ttl)
+    return env
+
+
+async def drive(base_url: str, endpoint: str, players: List[str], concurrency: int, duration: float) -> dict:
+    """Send requests to ``endpoint`` from ``concurrency`` workers for ``duration`` seconds."""
+    path_for = ENDPOINTS[endpoint]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(sys.maxsize))
+    deadline = time.monotonic() + duration
+
+    async def worker(session: aiohttp.ClientSession):
+        while time.monotonic() < deadline:
+            path = path_for(players[next(counter) % len(players)])
+            started = time.perf_counter()
+            try:
+                async with session.get(base_url + path, headers={"Accept-Encoding": "identity"}) as resp:
+                    await resp.read()
+                    status = str(resp.status)
+            except aiohttp.ClientError as exc:
+                status = type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.monotonic()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "status_codes": statuses,
+        "duration_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(1000 * sum(latencies) / max(1, len(latencies)), 2),
+            "p50": round(1000 * percentile(latencies, 0.50), 2),
+            "p95": round(1000 * percentile(latencies, 0.95), 2),
+            "p99": round(1000 * percentile(latencies, 0.99), 2),
+            "max": round(1000 * percentile(latencies, 1.0), 2),
+        },
+    }
+
+
+async def upstream_calls(upstream_url: str, reset: bool = False) -> dict:
+    async with aiohttp.ClientSession() as session:
+        if reset:
+            async with session.post(f"{upstream_url}/_reset"):
+                return {}
+        async with session.get(f"{upstream_url}/_calls") as resp:
+            return await resp.json()
+
+
+def run_endpoint(endpoint: str, args: argparse.Namespace, upstream_url: str) -> dict:
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    players = [uuid_for(i) for i in range(1, args.players + 1)]
+    uvicorn = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(args.app_port), "--no-access-log"]
+    with process(uvicorn, f"{app_url}/health", env=app_env(upstream_url, args), cwd=SRC_DIR):
+        asyncio.run(upstream_calls(upstream_url, reset=True))
+        result = asyncio.run(drive(app_url, endpoint, players, args.concurrency, args.duration))
+        result["upstream_calls"] = asyncio.run(upstream_calls(upstream_url))
+    return result
+
+
+def print_table(results: Dict[str, dict]):
+    print(f"{'endpoint':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}  upstream calls")
+    for endpoint, result in results.items():
+        latency = result["latency_ms"]
+        calls = ", ".join(f"{kind}={count}" for kind, count in sorted(result["upstream_calls"].items()))
+        print(f"{endpoint:<10} {result['requests_per_s']:>9} {latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9} {result['errors']:>7}  {calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated endpoints to run: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to drive each endpoint")
+    parser.add_argument("--players", type=int, default=GUILD_SIZE, help="Distinct players cycled through; fewer means more cache hits")
+    parser.add_argument("--latency", type=float, default=50, help="Fake upstream latency in milliseconds")
+    parser.add_argument("--jitter", type=float, default=10, help="Fake upstream latency jitter in milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of fake upstream calls that fail")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Override HypiLite's player and guild cache TTLs")
+    parser.add_argument("--app-port", type=int, default=9100)
+    parser.add_argument("--upstream-port", type=int, default=9101)
+    parser.add_argument("--output", default=None, help="Where to save the JSON results (default: bench/results/<time>.json)")
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    unknown = [endpoint for endpoint in endpoints if endpoint not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    fake = [
+        sys.executable, os.path.join(BENCH_DIR, "fake_upstream.py"), "--port", str(args.upstream_port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+    ]
+    results = {}
+    with process(fake, f"{upstream_url}/_calls"):
+        for endpoint in endpoints:
+            print(f"Running {endpoint} for {args.duration:g}s at concurrency {args.concurrency}...", file=sys.stderr)
+            results[endpoint] = run_endpoint(endpoint, args, upstream_url)
+
+    print_table(results)
+    output = args.output or os.path.join(BENCH_DIR, "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "results": results,
+        }, f, indent=2)
+    print(f"Saved results to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,36 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, Header, HTTPException, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse, StreamingResponse
 from models.responses import (
     PlayerUUIDResponse,
+    GuildData,
     GuildResponse,
+    GuildDetailsResponse,
     PlayerProfileResponse,
     BedwarsResponse,
+    PlayersResponse,
     ErrorResponse
 )
-import aiohttp
+from models.requests import PlayersRequest
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import orjson
+import re
 import uvicorn
-import math
-from utils import get_rank, get_username, format_timestamp, get_uuid, get_level_info
+import config
+from cache import Cached
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, REGISTRY, Snapshot, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from tracing import TimedRoute, TimingMiddleware, span
+from utils import get_username, get_usernames, format_timestamp, get_uuid, get_bedwars_stats, BEDWARS_MODE_ORDER, get_session, close_session, close_caches, cache_stats, upstream_stats, rate_limiter, get_player_entry, get_player_guild_entry, get_guild_entry, get_guild_entry_by_name, resolve_uuid, iter_usernames, map_as_completed
 
 app = FastAPI(
     docs_url="/swagger_docs",
     redoc_url="/docs",
 )
+# Time FastAPI's response model validation for Server-Timing
+app.router.route_class = TimedRoute
 
 # Enable CORS
 app.add_middleware(
@@ -27,13 +41,174 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON bodies for clients that accept it. Compressed bodies are
+# kept for as long as the data behind them can still be served.
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=config.COMPRESSION_MIN_SIZE,
+    gzip_level=config.GZIP_LEVEL,
+    brotli_quality=config.BROTLI_QUALITY,
+    cache_size=config.COMPRESSION_CACHE_SIZE,
+    cache_ttl=max(config.PLAYER_CACHE_TTL + config.PLAYER_CACHE_STALE_TTL, config.GUILD_CACHE_TTL + config.GUILD_CACHE_STALE_TTL),
+)
+
+# Trace each request's upstream calls and processing steps into a Server-Timing
+# header, and log the spans of slow requests
+app.add_middleware(TimingMiddleware, server_timing=config.SERVER_TIMING, slow_threshold=config.SLOW_REQUEST_THRESHOLD)
+
+# Time every request, outermost so compression is included
+app.add_middleware(MetricsMiddleware)
+
+# Headers describing how old the upstream data behind a response is, how long
+# clients and CDNs may reuse it, and which request headers it depends on
+CACHE_HEADERS = ("Age", "X-Cache", "Cache-Control", "Vary")
+
+def set_cache_headers(response: Optional[Response], entry: Cached, fresh_for: float):
+    if response is None:
+        return
+    response.headers["Age"] = str(int(entry.age))
+    response.headers["X-Cache"] = entry.status.upper()
+    # Clients may reuse the response for as long as our own copy stays fresh.
+    # Caches subtract Age from max-age themselves, so max-age is the full lifetime.
+    response.headers["Cache-Control"] = f"max-age={int(fresh_for)}"
+
+def cache_headers(response: Optional[Response]) -> Optional[dict]:
+    """The cache headers already set on ``response``, to copy onto a response returned directly."""
+    if response is None:
+        return None
+    return {name: response.headers[name] for name in CACHE_HEADERS if name in response.headers}
+
+def make_etag(body: bytes) -> str:
+    # Weak: the ETag names the JSON content, whichever encoding it is sent in, so
+    # compressed 200s and the 304s that revalidate them carry the same validator
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Whether an If-None-Match header matches ``etag``, using weak comparison."""
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque_tag:
+            return True
+    return False
+
+def respond(content: dict, response: Optional[Response] = None, if_none_match: Optional[str] = None):
+    """Return an endpoint's result.
+
+    With ``HYPILITE_FAST_JSON`` on, ``content`` is serialized as-is with orjson,
+    skipping FastAPI's re-validation against the route's response_model (which
+    still documents the response in OpenAPI). The builders below must therefore
+    return exactly what the route would produce from that model: every field
+    it outputs, in model order, with int and float fields already of the right
+    type.
+
+    Endpoints serving cached upstream data pass their injected ``response``:
+    they get an ETag computed from ``content``, and a 304 when the client's
+    ``if_none_match`` already has it.
+    """
+    if response is None:
+        if not config.FAST_JSON:
+            return content
+        with span("serialize"):
+            return ORJSONResponse(content)
+
+    with span("serialize"):
+        body = orjson.dumps(content)
+        headers = cache_headers(response)
+        headers["ETag"] = make_etag(body)
+    if if_none_match and etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if not config.FAST_JSON:
+        response.headers["ETag"] = headers["ETag"]
+        return content
+    return Response(body, media_type="application/json", headers=headers)
+
+NOT_MODIFIED = {"description": "Not modified: the ETag sent in `If-None-Match` is still current"}
+
+# Opt-in streaming: clients sending "Accept: application/x-ndjson" get one JSON record per line
+NDJSON = "application/x-ndjson"
+NDJSON_CONTENT = {"content": {NDJSON: {}}, "description": "Newline-delimited JSON records, sent with `Accept: application/x-ndjson`"}
+
+def vary_on_accept(response: Response):
+    """Mark a cacheable response whose body is JSON or NDJSON depending on the Accept header,
+    so caches keep the two apart."""
+    response.headers["Vary"] = "Accept"
+
+def ndjson_response(records: AsyncIterator[dict], response: Optional[Response] = None) -> StreamingResponse:
+    """Stream ``records`` as NDJSON, keeping any cache headers already set on ``response``."""
+    async def lines():
+        async for record in records:
+            yield orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return StreamingResponse(lines(), media_type=NDJSON, headers=cache_headers(response))
+
+@app.on_event("startup")
+async def startup():
+    # Open the shared upstream connection pool once for the app's lifetime
+    get_session()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_session()
+    await close_caches()
+
 @app.get("/")
 async def root():
     return RedirectResponse(url="/docs")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "caches": cache_stats(), "rate_limit": rate_limiter.stats(), "upstreams": upstream_stats()}
+
+def collect_stats() -> List[Snapshot]:
+    """Turn the counters behind /health into metrics."""
+    caches = {
+        stat: Snapshot(f"hypilite_cache_{stat}_total", "counter", f"Cache {stat}.", ("cache", "tier"))
+        for stat in ("hits", "misses", "evictions")
+    }
+    caches.update({
+        "size": Snapshot("hypilite_cache_entries", "gauge", "Entries held by each cache.", ("cache", "tier")),
+        "maxsize": Snapshot("hypilite_cache_max_entries", "gauge", "Entries each cache may hold.", ("cache", "tier")),
+    })
+    for cache, stats in cache_stats().items():
+        # Tiered caches report each tier separately
+        tiers = stats if "memory" in stats else {"memory": stats}
+        for tier, tier_stats in tiers.items():
+            for stat, value in tier_stats.items():
+                caches[stat].add(value, cache, tier)
+
+    rate_limit = rate_limiter.stats()
+    rate_limits = [
+        Snapshot("hypilite_rate_limit_requests_total", "counter", "Hypixel requests that asked for a rate limit token."),
+        Snapshot("hypilite_rate_limit_delayed_total", "counter", "Hypixel requests that had to wait for a token."),
+        Snapshot("hypilite_rate_limit_shed_total", "counter", "Requests answered with a 429 instead of waiting."),
+        Snapshot("hypilite_rate_limit_keys", "gauge", "API keys with a token bucket."),
+    ]
+    for metric, stat in zip(rate_limits, ("requests", "delayed", "shed", "keys")):
+        metric.add(rate_limit[stat])
+
+    upstreams = {
+        stat: Snapshot(f"hypilite_upstream_{stat}_total", "counter", help, ("upstream",))
+        for stat, help in (
+            ("requests", "Upstream requests made, not counting retries."),
+            ("retried", "Upstream request attempts that were retries."),
+            ("hedged", "Upstream requests raced by a second, hedged request."),
+        )
+    }
+    circuit = Snapshot("hypilite_upstream_circuit_state", "gauge", "1 for each upstream's current circuit breaker state.", ("upstream", "state"))
+    for upstream, stats in upstream_stats().items():
+        for stat, metric in upstreams.items():
+            metric.add(stats[stat], upstream)
+        for state in ("closed", "open", "half-open"):
+            circuit.add(int(stats["circuit"] == state), upstream, state)
+
+    return [*caches.values(), *rate_limits, *upstreams.values(), circuit]
+
+REGISTRY.add_collector(collect_stats)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
 
 @app.get("/api/uuid/{username_or_uuid}", response_model=PlayerUUIDResponse, responses={404: {"model": ErrorResponse}})
 async def get_player_uuid(username_or_uuid: str):
@@ -47,13 +222,13 @@ async def get_player_uuid(username_or_uuid: str):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Player not found"
             )
-        return {
+        return respond({
             "success": True,
             "data": {
                 "uuid": username_or_uuid,
                 "username": name
             }
-        }
+        })
 
     
     uuid = await get_uuid(username_or_uuid)
@@ -63,85 +238,46 @@ async def get_player_uuid(username_or_uuid: str):
             detail="Player not found"
         )
     
-    return {
+    return respond({
         "success": True,
         "data": {
             "uuid": uuid,
             "username": username_or_uuid
         }
-    }
+    })
 
-@app.get("/api/profile/{uuid}", response_model=PlayerProfileResponse, responses={401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def get_profile(uuid: str, api_key: str):
+async def build_profile(uuid: str, api_key: str, response: Optional[Response] = None) -> dict:
+    """Build the profile data for a player; raises HTTPException on failure."""
     uuid = str(uuid).replace("-", "")
-    url = f"https://api.hypixel.net/v2/player?uuid={uuid}"
-    headers = {"API-Key": api_key}
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            data = await resp.json()
-            
-            if resp.status == 401 or data == {"success": False, "cause": "Invalid API key"}:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid API key"
-                )
-            elif resp.status == 422 or data == {"success":False,"cause":"Malformed UUID"}:
-                raise HTTPException(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    detail="Invalid UUID"
-                )
-            elif resp.status != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Hypixel API error"
-                )
-
-    if not data.get("success", False):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Player not found"
-        )
-
-    player_data = data.get("player", {})
-    if not player_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Player data not found"
-        )
+    player = await get_player_entry(uuid, api_key)
+    set_cache_headers(response, player, config.PLAYER_CACHE_TTL)
+    record = player.value
 
     # Get player username
     username = await get_username(uuid)
-    rank = await get_rank(uuid, data)
 
-    # Get timestamps
-    first_login = player_data.get("firstLogin", 0)
-    last_login = player_data.get("lastLogin", 0)
-    last_logout = player_data.get("lastLogout", 0)
-    
-    return {
-        "success": True,
-        "data": {
+    with span("compute"):
+        return {
             "uuid": uuid,
             "username": username,
-            "rank": rank,
-            "first_login": first_login,
-            "first_login_pretty": format_timestamp(first_login),
-            "last_login": last_login,
-            "last_login_pretty": format_timestamp(last_login),
-            "last_logout": last_logout,
-            "last_logout_pretty": format_timestamp(last_logout),
-            "exp": player_data.get("networkExp", 0),
-            "network_level": round((math.sqrt((2 * player_data.get("networkExp", 0)) + 30625) / 50) - 2.5, 2),
-            "karma": player_data.get("karma", 0),
-            "achievement_points": player_data.get("achievementPoints", 0),
-            "total_rewards": player_data.get("totalRewards", 0),
-            "total_daily_rewards": player_data.get("totalDailyRewards", 0),
-            "reward_streak": player_data.get("rewardStreak", 0),
-            "reward_score": player_data.get("rewardScore", 0),
-            "reward_high_score": player_data.get("rewardHighScore", 0),
-            "most_recent_game": player_data.get("mostRecentGameType", "unknown"),
-            "online": player_data.get("lastLogin", 0) > player_data.get("lastLogout", 0),
+            "rank": record.rank,
+            "first_login": record.first_login,
+            "first_login_pretty": record.first_login_pretty,
+            "last_login": record.last_login,
+            "last_login_pretty": record.last_login_pretty,
+            "last_logout": record.last_logout,
+            "last_logout_pretty": record.last_logout_pretty,
+            "exp": record.network_exp,
+            "network_level": record.network_level,
+            "karma": record.karma,
+            "achievement_points": record.achievement_points,
+            "total_rewards": record.total_rewards,
+            "total_daily_rewards": record.total_daily_rewards,
+            "reward_streak": record.reward_streak,
+            "reward_score": record.reward_score,
+            "reward_high_score": record.reward_high_score,
+            "most_recent_game": record.most_recent_game,
+            "online": record.last_login > record.last_logout,
             "images": {
                 "full_skin_image": f"https://crafatar.com/renders/body/{uuid}",
                 "3d_head_image": f"https://crafatar.com/renders/head/{uuid}",
@@ -149,359 +285,333 @@ async def get_profile(uuid: str, api_key: str):
                 "network_level_image": f"https://gen.plancke.io/exp/{username}.png",
             }
         }
+
+def format_guild_member(member: dict, username: str) -> dict:
+    # Get timestamps
+    joined = member.get("joined", 0)
+
+    return {
+        "uuid": member["uuid"],
+        "username": username,
+        "joined": joined,
+        "joined_pretty": format_timestamp(joined),
+        "quests": member.get("questParticipation", 0),
+        "rank": member.get("rank", "not found"),
+        "weekly_exp": member.get("expHistory", {}).get("weekly", 0),
+        "daily_exp": member.get("expHistory", {}).get("daily", 0),
+        "role": member.get("role", "not found")
     }
 
-@app.get("/api/guild/{uuid}", response_model=GuildResponse, responses={401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def get_guild(uuid: str, api_key: str):
+# Guild data for players without a guild: every GuildData field is null except in_guild
+NOT_IN_GUILD = {**dict.fromkeys(GuildData.__fields__), "in_guild": False}
+
+async def build_guild_info(uuid: str, api_key: str, response: Optional[Response] = None) -> Tuple[dict, List[dict]]:
+    """Build the guild data for a player without its members list; raises HTTPException on failure.
+    
+    Returns the guild data and the guild's raw member entries.
+    """
     uuid = str(uuid).replace("-", "")
-    url = f"https://api.hypixel.net/v2/guild?player={uuid}"
-    headers = {"API-Key": api_key}
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            guild_data = await resp.json()
-            
-            if resp.status == 401 or guild_data == {"success": False, "cause": "Invalid API key"}:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid API key"
-                )
-            elif resp.status == 422 or guild_data == {"success":False,"cause":"Malformed UUID"}:
-                raise HTTPException(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    detail="Invalid UUID"
-                )
-            elif resp.status != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Hypixel API error"
-                )
+    guild_entry = await get_player_guild_entry(uuid, api_key)
+    set_cache_headers(response, guild_entry, config.GUILD_CACHE_TTL)
+    guild_data = guild_entry.value
 
     # Process Guild Data
     guild = guild_data.get("guild")
     if not guild:
-        return {
-            "success": True,
-            "data": {
-                "in_guild": False
-            }
-        }
+        return dict(NOT_IN_GUILD), []
 
     # Get player username
     username = await get_username(uuid)
 
-    # Get timestamps
-    created = guild.get("created", 0)
+    with span("compute"):
+        # Get timestamps
+        created = guild.get("created", 0)
 
-    guild_info = {
-        "uuid": uuid,
-        "username": username,
-        "in_guild": True,
-        "name": guild.get("name", "not found"),
-        "tag": guild.get("tag", "not found"),
-        "tag_color": guild.get("tagColor", "not found"),
-        "exp": guild.get("exp", 0),
-        "created": created,
-        "created_pretty": format_timestamp(created)
-    }
+        guild_info = {
+            "uuid": uuid,
+            "username": username,
+            "in_guild": True,
+            "name": guild.get("name", "not found"),
+            "tag": guild.get("tag", "not found"),
+            "tag_color": guild.get("tagColor", "not found"),
+            "exp": guild.get("exp", 0),
+            "created": created,
+            "created_pretty": format_timestamp(created)
+        }
     
-    # Process Guild Members
-    guild_members = guild.get("members", [])
-    formatted_members = []
-    current_member_data = {}
-
-    for member in guild_members:
-        member_uuid = member.get("uuid")
-        if not member_uuid:
-            continue
-
-        # Get member username
-        try:
-            member_username = await get_username(member_uuid)
-        except:
-            member_username = "Unknown"
+        guild_members = [member for member in guild.get("members", []) if member.get("uuid")]
+        current_member_data = next((member for member in guild_members if member["uuid"] == uuid), {})
 
-        # Get timestamps
-        joined = member.get("joined", 0)
+        # Get timestamps for current member
+        joined = current_member_data.get("joined", 0)
 
-        member_info = {
-            "uuid": member_uuid,
-            "username": member_username,
+        # Add member data to guild info
+        guild_info.update({
+            "quests": current_member_data.get("quests", 0),
             "joined": joined,
             "joined_pretty": format_timestamp(joined),
-            "quests": member.get("questParticipation", 0),
-            "rank": member.get("rank", "not found"),
-            "weekly_exp": member.get("expHistory", {}).get("weekly", 0),
-            "daily_exp": member.get("expHistory", {}).get("daily", 0),
-            "role": member.get("role", "not found")
-        }
-        formatted_members.append(member_info)
-        
-        if member_uuid == uuid:
-            current_member_data = member
+            "weekly_exp": current_member_data.get("weekly_exp", 0)
+        })
 
-    # Get timestamps for current member
-    joined = current_member_data.get("joined", 0)
+        return guild_info, guild_members
 
-    # Add member data to guild info
-    guild_info.update({
-        "quests": current_member_data.get("quests", 0),
-        "joined": joined,
-        "joined_pretty": format_timestamp(joined),
-        "weekly_exp": current_member_data.get("weekly_exp", 0),
-        "daily_exp": current_member_data.get("daily_exp", 0),
-        "role": current_member_data.get("role", "not found"),
-        "members": formatted_members
-    })
+async def build_guild(uuid: str, api_key: str, response: Optional[Response] = None) -> dict:
+    """Build the guild data for a player; raises HTTPException on failure."""
+    guild_info, guild_members = await build_guild_info(uuid, api_key, response)
+    if not guild_info["in_guild"]:
+        return guild_info
 
-    return {
-        "success": True,
-        "data": guild_info
-    }
+    return await add_guild_members(guild_info, guild_members)
+
+async def add_guild_members(guild_info: dict, guild_members: List[dict]) -> dict:
+    """Resolve the members' usernames and add the formatted members list to ``guild_info``."""
+    with span("usernames"):
+        member_usernames = await get_usernames([member["uuid"] for member in guild_members])
+    with span("compute"):
+        guild_info["members"] = [
+            format_guild_member(member, member_username)
+            for member, member_username in zip(guild_members, member_usernames)
+        ]
+        return guild_info
+
+def build_guild_details(guild_entry: Cached, response: Optional[Response] = None) -> Tuple[dict, List[dict]]:
+    """Build a guild's data without its members list; raises HTTPException if there is no such guild.
     
-@app.get("/api/bedwars/{uuid}", response_model=BedwarsResponse, responses={401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def bedwars_stats(uuid: str, api_key: str):
-    uuid = str(uuid).replace("-", "")
-    url = f"https://api.hypixel.net/v2/player?uuid={uuid}"
-    headers = {"API-Key": api_key}
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            data = await resp.json()
-            
-            if resp.status == 401 or data == {"success": False, "cause": "Invalid API key"}:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid API key"
-                )
-            elif resp.status == 422 or data == {"success":False,"cause":"Malformed UUID"}:
-                raise HTTPException(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    detail="Invalid UUID"
-                )
-            elif resp.status != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Hypixel API error"
-                )
-
-    if not data.get("success", False):
+    Returns the guild data and the guild's raw member entries.
+    """
+    set_cache_headers(response, guild_entry, config.GUILD_CACHE_TTL)
+    guild = guild_entry.value.get("guild")
+    if not guild:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Player not found"
+            detail="Guild not found"
         )
 
-    player_data = data.get("player", {})
-    if not player_data:
+    with span("compute"):
+        # Get timestamps
+        created = guild.get("created", 0)
+
+        guild_info = {
+            "id": guild["_id"],
+            "name": guild.get("name", "not found"),
+            "tag": guild.get("tag", "not found"),
+            "tag_color": guild.get("tagColor", "not found"),
+            "exp": guild.get("exp", 0),
+            "created": created,
+            "created_pretty": format_timestamp(created)
+        }
+        guild_members = [member for member in guild.get("members", []) if member.get("uuid")]
+        return guild_info, guild_members
+
+async def stream_guild(guild_info: dict, guild_members: List[dict]) -> AsyncIterator[dict]:
+    """Yield the guild record, then each member as its username resolves, then a summary."""
+    yield {"type": "guild", **guild_info}
+
+    unknown = 0
+    uuids = [member["uuid"] for member in guild_members]
+    async for index, member_username in iter_usernames(uuids):
+        unknown += member_username == "Unknown"
+        yield {"type": "member", "index": index, **format_guild_member(guild_members[index], member_username)}
+
+    yield {"type": "summary", "members": len(guild_members), "unknown_usernames": unknown}
+    
+# Top-level sections of the Bedwars data that can be picked with ?fields=
+BEDWARS_SECTIONS = ("level", "resources", "stats")
+
+def parse_selection(values: Optional[List[str]], allowed: Iterable[str], name: str) -> Optional[List[str]]:
+    """Flatten comma-separated and repeated query values; None if nothing was selected.
+    
+    Raises HTTPException 422 for values that are not in ``allowed``.
+    """
+    if not values:
+        return None
+    selected = [value.strip() for item in values for value in item.split(",") if value.strip()]
+    unknown = [value for value in selected if value not in allowed]
+    if unknown:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Player data not found"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown {name}: {', '.join(unknown)}"
         )
+    return selected
+
+async def build_bedwars(
+    uuid: str,
+    api_key: str,
+    response: Optional[Response] = None,
+    fields: Optional[Iterable[str]] = None,
+    modes: Optional[Iterable[str]] = None,
+) -> dict:
+    """Build the Bedwars data for a player; raises HTTPException on failure.
     
-    xp = player_data["stats"]["Bedwars"]["Experience"]
-    level, prestige, xp_to_next_level, progress_percentage = get_level_info(xp)
-    
-    bedwars_data = player_data.get("stats", {}).get("Bedwars", {})
-    if not bedwars_data:
+    Only the ``fields`` sections (from ``BEDWARS_SECTIONS``) and the stats for
+    ``modes`` are computed and returned; everything by default.
+    """
+    uuid = str(uuid).replace("-", "")
+    sections = set(BEDWARS_SECTIONS if fields is None else fields)
+    player = await get_player_entry(uuid, api_key)
+    set_cache_headers(response, player, config.PLAYER_CACHE_TTL)
+    record = player.value
+
+    if record.bedwars_counters is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="BedWars data not found"
         )
-    
 
-    
-    if bedwars_data.get("slumber", {}).get("bag_type", None) == "MINI_WALLET":
-        slumber_tickets_max = 25
-    elif bedwars_data.get("slumber", {}).get("bag_type", None) == "LIGHT_SLUMBERS_WALLET":
-        slumber_tickets_max = 99
-    elif bedwars_data.get("slumber", {}).get("bag_type", None) == "LIGHT_IMPERIAL_WALLET":
-        slumber_tickets_max = 500
-    elif bedwars_data.get("slumber", {}).get("bag_type", None) == "EXPLORERS_WALLET":
-        slumber_tickets_max = 5_000
-    elif bedwars_data.get("slumber", {}).get("bag_type", None) == "HOTEL_STAFF_WALLET":
-        slumber_tickets_max = 10_000
-    elif bedwars_data.get("slumber", {}).get("bag_type", None) == "PLATINUM_MEMBERSHIP_WALLET":
-        slumber_tickets_max = 100_000
-    elif bedwars_data.get("slumber", {}).get("bag_type", None):
-        slumber_tickets_max = 0
-    
-    # Global tickets and tokens
-    resources = {
-        "tokens": bedwars_data.get("coins", 0),
-        "slumber_tickets": bedwars_data.get("slumber", {}).get("tickets", 0),
-        "slumber_tickets_max": slumber_tickets_max,
-        "slumber_tickets_total": bedwars_data.get("slumber", {}).get("total_tickets_earned", 0),
-    }
-    
-    # Define combined gamemode mappings
-    combined_modes = {
-        "ultimate": ["eight_two_ultimate_", "four_four_ultimate_"],
-        "lucky": ["eight_two_lucky_", "four_four_lucky_"],
-        "rush": ["eight_two_rush_", "four_four_rush_"],
-        "swap": ["eight_two_swap_", "four_four_swap_"]
-    }
-    
-    gamemodes = {
-        "overall": "",                                   # ALl gamemodes
-        "core": None,                                    # Special case: will sum up solo, doubles, threes, fours
-        "eight_one": "eight_one_",                       # Solo
-        "eight_two": "eight_two_",                       # Doubles 
-        "four_three": "four_three_",                     # Threes
-        "four_four": "four_four_",                       # Fours
-        "two_four": "two_four_",                         # 4v4
-        "four_four_armed": "four_four_armed_",           # Fours armed
-        "castle": "castle_",                             # Castle 40v40
-        "four_four_lucky": "four_four_lucky_",           # Fours lucky
-        "eight_two_lucky": "eight_two_lucky_",           # Doubles lucky
-        "eight_two_rush": "eight_two_rush_",             # Doubles rush
-        "four_four_rush": "four_four_rush_",             # Fours rush
-        "eight_two_swap": "eight_two_swap_",             # Doubles swap
-        "four_four_swap": "four_four_swap_",             # Fours swap
-        "eight_two_ultimate": "eight_two_ultimate_",     # Doubles ultimate
-        "four_four_ultimate": "four_four_ultimate_",     # Fours ultimate
-        "four_four_underworld": "four_four_underworld_", # Fours underworld
-        "four_four_voidless": "four_four_voidless_"      # Fours voidless
+    bedwars = {
+        "uuid": uuid,
+        "username": record.displayname,
     }
-    
-    # Add combined modes to gamemodes dictionary
-    gamemodes.update({
-        "ultimate": None,  # Will combine eight_two_ultimate and four_four_ultimate
-        "lucky": None,     # Will combine eight_two_lucky and four_four_lucky
-        "rush": None,      # Will combine eight_two_rush and four_four_rush
-        "swap": None       # Will combine eight_two_swap and four_four_swap
-    })
-    
-    core_modes = ["eight_one_", "eight_two_", "four_three_", "four_four_"]
-    
-    stats = {}
-    bedwars_data = player_data.get("stats", {}).get("Bedwars", {})
-    
-    for mode_key, mode_prefix in gamemodes.items():
-        if mode_key in combined_modes:
-            # Get stats for combined modes (like ultimate, lucky, etc)
-            prefixes = combined_modes[mode_key]
-            wins = sum(bedwars_data.get(f"{prefix}wins_bedwars", 0) for prefix in prefixes)
-            losses = sum(bedwars_data.get(f"{prefix}losses_bedwars", 0) for prefix in prefixes)
-            final_kills = sum(bedwars_data.get(f"{prefix}final_kills_bedwars", 0) for prefix in prefixes)
-            final_deaths = sum(bedwars_data.get(f"{prefix}final_deaths_bedwars", 0) for prefix in prefixes)
-            kills = sum(bedwars_data.get(f"{prefix}kills_bedwars", 0) for prefix in prefixes)
-            deaths = sum(bedwars_data.get(f"{prefix}deaths_bedwars", 0) for prefix in prefixes)
-            beds_broken = sum(bedwars_data.get(f"{prefix}beds_broken_bedwars", 0) for prefix in prefixes)
-            beds_lost = sum(bedwars_data.get(f"{prefix}beds_lost_bedwars", 0) for prefix in prefixes)
-            
-            mode_stats = {
-                # Resources
-                f"{mode_key}_emeralds": sum(bedwars_data.get(f"{prefix}emerald_resources_collected_bedwars", 0) for prefix in prefixes),
-                f"{mode_key}_diamonds": sum(bedwars_data.get(f"{prefix}diamond_resources_collected_bedwars", 0) for prefix in prefixes),
-                f"{mode_key}_gold": sum(bedwars_data.get(f"{prefix}gold_resources_collected_bedwars", 0) for prefix in prefixes),
-                f"{mode_key}_iron": sum(bedwars_data.get(f"{prefix}iron_resources_collected_bedwars", 0) for prefix in prefixes),
-                
-                # Standard stats
-                f"{mode_key}_wins": wins,
-                f"{mode_key}_losses": losses,
-                f"{mode_key}_final_kills": final_kills,
-                f"{mode_key}_final_deaths": final_deaths,
-                f"{mode_key}_kills": kills,
-                f"{mode_key}_deaths": deaths,
-                f"{mode_key}_beds_broken": beds_broken,
-                f"{mode_key}_beds_lost": beds_lost,
-                
-                # Ratios
-                f"{mode_key}_wlr": round(wins / losses if losses > 0 else wins, 2),
-                f"{mode_key}_kdr": round(kills / deaths if deaths > 0 else kills, 2),
-                f"{mode_key}_fkdr": round(final_kills / final_deaths if final_deaths > 0 else final_kills, 2),
-                f"{mode_key}_bblr": round(beds_broken / beds_lost if beds_lost > 0 else beds_broken, 2)
-            }
-        elif mode_key == "core":
-            # Get stats for core modes
-            wins = sum(bedwars_data.get(f"{prefix}wins_bedwars", 0) for prefix in core_modes)
-            losses = sum(bedwars_data.get(f"{prefix}losses_bedwars", 0) for prefix in core_modes)
-            final_kills = sum(bedwars_data.get(f"{prefix}final_kills_bedwars", 0) for prefix in core_modes)
-            final_deaths = sum(bedwars_data.get(f"{prefix}final_deaths_bedwars", 0) for prefix in core_modes)
-            kills = sum(bedwars_data.get(f"{prefix}kills_bedwars", 0) for prefix in core_modes)
-            deaths = sum(bedwars_data.get(f"{prefix}deaths_bedwars", 0) for prefix in core_modes)
-            beds_broken = sum(bedwars_data.get(f"{prefix}beds_broken_bedwars", 0) for prefix in core_modes)
-            beds_lost = sum(bedwars_data.get(f"{prefix}beds_lost_bedwars", 0) for prefix in core_modes)
-            
-            mode_stats = {
-                # Resources
-                f"{mode_key}_emeralds": sum(bedwars_data.get(f"{prefix}emerald_resources_collected_bedwars", 0) for prefix in core_modes),
-                f"{mode_key}_diamonds": sum(bedwars_data.get(f"{prefix}diamond_resources_collected_bedwars", 0) for prefix in core_modes),
-                f"{mode_key}_gold": sum(bedwars_data.get(f"{prefix}gold_resources_collected_bedwars", 0) for prefix in core_modes),
-                f"{mode_key}_iron": sum(bedwars_data.get(f"{prefix}iron_resources_collected_bedwars", 0) for prefix in core_modes),
-                
-                # Standard stats
-                f"{mode_key}_wins": wins,
-                f"{mode_key}_losses": losses,
-                f"{mode_key}_final_kills": final_kills,
-                f"{mode_key}_final_deaths": final_deaths,
-                f"{mode_key}_kills": kills,
-                f"{mode_key}_deaths": deaths,
-                f"{mode_key}_beds_broken": beds_broken,
-                f"{mode_key}_beds_lost": beds_lost,
-                
-                # Ratios
-                f"{mode_key}_wlr": round(wins / losses if losses > 0 else wins, 2),
-                f"{mode_key}_kdr": round(kills / deaths if deaths > 0 else kills, 2),
-                f"{mode_key}_fkdr": round(final_kills / final_deaths if final_deaths > 0 else final_kills, 2),
-                f"{mode_key}_bblr": round(beds_broken / beds_lost if beds_lost > 0 else beds_broken, 2)
-            }
-        else:
-            # Get stats for individual mode
-            wins = bedwars_data.get(f"{mode_prefix}wins_bedwars", 0)
-            losses = bedwars_data.get(f"{mode_prefix}losses_bedwars", 0)
-            final_kills = bedwars_data.get(f"{mode_prefix}final_kills_bedwars", 0)
-            final_deaths = bedwars_data.get(f"{mode_prefix}final_deaths_bedwars", 0)
-            kills = bedwars_data.get(f"{mode_prefix}kills_bedwars", 0)
-            deaths = bedwars_data.get(f"{mode_prefix}deaths_bedwars", 0)
-            beds_broken = bedwars_data.get(f"{mode_prefix}beds_broken_bedwars", 0)
-            beds_lost = bedwars_data.get(f"{mode_prefix}beds_lost_bedwars", 0)
-            
-            mode_stats = {
-                # Resources
-                f"{mode_key}_emeralds": bedwars_data.get(f"{mode_prefix}emerald_resources_collected_bedwars", 0),
-                f"{mode_key}_diamonds": bedwars_data.get(f"{mode_prefix}diamond_resources_collected_bedwars", 0),
-                f"{mode_key}_gold": bedwars_data.get(f"{mode_prefix}gold_resources_collected_bedwars", 0),
-                f"{mode_key}_iron": bedwars_data.get(f"{mode_prefix}iron_resources_collected_bedwars", 0),
-                
-                # Standard stats
-                f"{mode_key}_wins": wins,
-                f"{mode_key}_losses": losses,
-                f"{mode_key}_final_kills": final_kills,
-                f"{mode_key}_final_deaths": final_deaths,
-                f"{mode_key}_kills": kills,
-                f"{mode_key}_deaths": deaths,
-                f"{mode_key}_beds_broken": beds_broken,
-                f"{mode_key}_beds_lost": beds_lost,
-                
-                # Ratios
-                f"{mode_key}_wlr": round(wins / losses if losses > 0 else wins, 2),
-                f"{mode_key}_kdr": round(kills / deaths if deaths > 0 else kills, 2),
-                f"{mode_key}_fkdr": round(final_kills / final_deaths if final_deaths > 0 else final_kills, 2),
-                f"{mode_key}_bblr": round(beds_broken / beds_lost if beds_lost > 0 else beds_broken, 2)
+
+    with span("compute"):
+        if "level" in sections:
+            bedwars.update({
+                "xp": record.bedwars_xp,
+                "level": record.bedwars_level,
+                "prestige": record.bedwars_prestige,
+                "next_level": record.bedwars_next_level,
+                "xp_to_next_level": record.bedwars_xp_to_next_level,
+                "progress_to_next_level_percentage": record.bedwars_progress,
+            })
+
+        if "resources" in sections:
+            # Global tickets and tokens
+            bedwars["resources"] = {
+                "tokens": record.bedwars_tokens,
+                "slumber_tickets": record.slumber_tickets,
+                "slumber_tickets_max": record.slumber_tickets_max,
+                "slumber_tickets_total": record.slumber_tickets_total,
             }
-        stats[mode_key] = mode_stats
-    
+
+        if "stats" in sections:
+            bedwars["stats"] = get_bedwars_stats(record.bedwars_counters, modes)
+
+        return bedwars
+
+@app.get("/api/profile/{uuid}", response_model=PlayerProfileResponse, responses={304: NOT_MODIFIED, 401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 429: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def get_profile(uuid: str, api_key: str, response: Response, if_none_match: Optional[str] = Header(None)):
+    return respond({
+        "success": True,
+        "data": await build_profile(uuid, api_key, response)
+    }, response, if_none_match)
+
+@app.get("/api/guild/{uuid}", response_model=GuildResponse, responses={200: NDJSON_CONTENT, 304: NOT_MODIFIED, 401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 429: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def get_guild(uuid: str, api_key: str, response: Response, accept: str = Header("application/json"), if_none_match: Optional[str] = Header(None)):
+    vary_on_accept(response)
+    if NDJSON in accept:
+        guild_info, guild_members = await build_guild_info(uuid, api_key, response)
+        return ndjson_response(stream_guild(guild_info, guild_members), response)
+
+    return respond({
+        "success": True,
+        "data": await build_guild(uuid, api_key, response)
+    }, response, if_none_match)
+
+@app.get("/api/bedwars/{uuid}", response_model=BedwarsResponse, response_model_exclude_none=True, responses={304: NOT_MODIFIED, 401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 429: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def bedwars_stats(
+    uuid: str,
+    api_key: str,
+    response: Response,
+    fields: Optional[List[str]] = Query(None, description="Sections to return: level, resources and/or stats, comma-separated or repeated. All by default."),
+    modes: Optional[List[str]] = Query(None, description="Modes to return stats for, e.g. overall,core. All by default."),
+    if_none_match: Optional[str] = Header(None),
+):
+    fields = parse_selection(fields, BEDWARS_SECTIONS, "field")
+    modes = parse_selection(modes, BEDWARS_MODE_ORDER, "mode")
+    return respond({
+        "success": True,
+        "data": await build_bedwars(uuid, api_key, response, fields, modes)
+    }, response, if_none_match)
+
+# Hypixel guild IDs are 24-digit hex object IDs
+GUILD_ID = re.compile(r"[0-9a-fA-F]{24}")
+
+async def guild_details_response(guild_entry: Cached, response: Response, accept: str, if_none_match: Optional[str]):
+    vary_on_accept(response)
+    guild_info, guild_members = build_guild_details(guild_entry, response)
+    if NDJSON in accept:
+        return ndjson_response(stream_guild(guild_info, guild_members), response)
+
+    return respond({
+        "success": True,
+        "data": await add_guild_members(guild_info, guild_members)
+    }, response, if_none_match)
+
+@app.get("/api/guild/by-name/{name}", response_model=GuildDetailsResponse, responses={200: NDJSON_CONTENT, 304: NOT_MODIFIED, 401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 429: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def get_guild_by_name(name: str, api_key: str, response: Response, accept: str = Header("application/json"), if_none_match: Optional[str] = Header(None)):
+    guild_entry = await get_guild_entry_by_name(name, api_key)
+    return await guild_details_response(guild_entry, response, accept, if_none_match)
+
+@app.get("/api/guild/by-id/{guild_id}", response_model=GuildDetailsResponse, responses={200: NDJSON_CONTENT, 304: NOT_MODIFIED, 401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 429: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def get_guild_by_id(guild_id: str, api_key: str, response: Response, accept: str = Header("application/json"), if_none_match: Optional[str] = Header(None)):
+    if not GUILD_ID.fullmatch(guild_id):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid guild ID"
+        )
+    guild_entry = await get_guild_entry(guild_id, api_key)
+    return await guild_details_response(guild_entry, response, accept, if_none_match)
+
+# Builders for each field that can be requested from /api/players
+BATCH_BUILDERS = {
+    "profile": build_profile,
+    "bedwars": build_bedwars,
+    "guild": build_guild,
+}
+
+def batch_error(exc: Exception) -> dict:
+    if isinstance(exc, HTTPException):
+        return {"status_code": exc.status_code, "detail": exc.detail}
+    return {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": "Internal server error"}
+
+async def build_batch_item(player: str, fields: List[str], api_key: str) -> dict:
+    """Look up the requested fields for one player, collecting errors instead of raising them."""
+    item = {"player": player, "uuid": None, "success": True, "data": dict.fromkeys(BATCH_BUILDERS), "errors": {}}
     try:
-        next_level = int(str(level).split(".")[0]) + 1
-    except KeyError:
-        next_level = level + 1
-        
-    return {
+        uuid = await resolve_uuid(player)
+    except Exception as exc:
+        item["success"] = False
+        item["errors"]["player"] = batch_error(exc)
+        return item
+
+    item["uuid"] = uuid
+    results = await asyncio.gather(*(BATCH_BUILDERS[field](uuid, api_key) for field in fields), return_exceptions=True)
+    for field, result in zip(fields, results):
+        if isinstance(result, Exception):
+            item["success"] = False
+            item["errors"][field] = batch_error(result)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            item["data"][field] = result
+    return item
+
+async def stream_players(players: List[str], fields: List[str], api_key: str) -> AsyncIterator[dict]:
+    """Yield each player's result as soon as it is ready, then a summary."""
+    failed = 0
+    lookup = lambda player: build_batch_item(player, fields, api_key)
+    async for index, item in map_as_completed(lookup, players, config.BATCH_CONCURRENCY):
+        failed += not item["success"]
+        yield {"type": "player", "index": index, **item}
+
+    yield {"type": "summary", "players": len(players), "succeeded": len(players) - failed, "failed": failed}
+
+@app.post("/api/players", response_model=PlayersResponse, responses={200: NDJSON_CONTENT, 422: {"model": ErrorResponse}})
+async def get_players(players_request: PlayersRequest, api_key: str, accept: str = Header("application/json")):
+    fields = list(dict.fromkeys(players_request.fields))
+    if NDJSON in accept:
+        return ndjson_response(stream_players(players_request.players, fields, api_key))
+
+    semaphore = asyncio.Semaphore(config.BATCH_CONCURRENCY)
+
+    async def lookup(player: str) -> dict:
+        async with semaphore:
+            return await build_batch_item(player, fields, api_key)
+
+    return respond({
         "success": True,
-        "data": {
-            "uuid": uuid,
-            "username": player_data.get("displayname", "not found"),
-            "xp": xp,
-            "level": level,
-            "prestige": prestige,
-            "next_level": next_level,
-            "xp_to_next_level": xp_to_next_level,
-            "progress_to_next_level_percentage": progress_percentage,
-            "resources": resources,
-            "stats": stats
-        }
-    }
-    
+        "data": await asyncio.gather(*(lookup(player) for player in players_request.players))
+    })
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
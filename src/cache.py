@@ -0,0 +1,282 @@
+import asyncio
+import json
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+# Returned by TTLCache.get when a key is missing or expired
+MISSING = object()
+
+
+class Cached(NamedTuple):
+    """A value read through a cache."""
+    value: Any
+    age: float   # Seconds since the value was fetched from upstream
+    status: str  # "hit", "stale" (served while being refreshed) or "miss" (just fetched)
+
+
+class TTLCache:
+    """A bounded least-recently-used cache whose entries expire after a TTL.
+
+    Keeps hit/miss/eviction counters so the cache can be sized from real traffic.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value for ``key``, or ``default`` if missing or expired."""
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store ``value`` under ``key`` for ``ttl`` seconds (defaults to the cache TTL)."""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one shared in-flight call.
+
+    Every caller waiting on a key gets the shared result, or the shared exception.
+    Cancelling one caller does not cancel the shared call for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Await ``func(*args)``, or join the call already in flight for ``key``."""
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func(*args))
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(call)
+
+    def _forget(self, key: Hashable, call: asyncio.Future):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not call.cancelled():
+            call.exception()
+
+
+class CacheBackend:
+    """Interface for caches of JSON-serializable upstream documents.
+
+    Entries are stored with the wall-clock time they were fetched, so callers
+    decide for themselves whether an entry is still fresh enough to use.
+    Backends only drop entries older than their retention time.
+    """
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return ``(value, fetched_at)`` for ``key``, or None if it is not cached."""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, fetched_at: Optional[float] = None):
+        """Store ``value`` for ``key``; ``fetched_at`` defaults to now."""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """In-process backend on top of a TTLCache. Fast, but per worker and lost on restart."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self._cache.get(key)
+        return None if entry is MISSING else entry
+
+    async def set(self, key: str, value: Any, fetched_at: Optional[float] = None):
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        # Keep the entry only for what is left of its retention time
+        self._cache.set(key, (value, fetched_at), ttl=self._cache.ttl - (time.time() - fetched_at))
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class SQLiteStore:
+    """A SQLite database (in WAL mode) shared by every SQLiteBackend namespace.
+
+    Values are stored as zlib-compressed JSON. All queries run on one background
+    thread so they never block the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hypilite-sqlite")
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._db = db
+        return self._db
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(self._connect(), *args))
+
+    async def close(self):
+        if self._db is not None:
+            db, self._db = self._db, None
+            await asyncio.get_event_loop().run_in_executor(self._executor, db.close)
+
+
+class SQLiteBackend(CacheBackend):
+    """Persistent backend storing one namespace of a SQLiteStore.
+
+    Survives restarts and is shared by every worker using the same database file.
+    Values that are not JSON-serializable need an ``encode`` function turning
+    them into something that is, and a ``decode`` function turning that back.
+    """
+
+    # Expired rows are deleted once every this many writes
+    PRUNE_INTERVAL = 1_000
+
+    def __init__(self, store: SQLiteStore, namespace: str, ttl: float,
+                 encode: Optional[Callable[[Any], Any]] = None, decode: Optional[Callable[[Any], Any]] = None):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.encode = encode
+        self.decode = decode
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+    def _get(self, db: sqlite3.Connection, key: str) -> Optional[Tuple[Any, float]]:
+        row = db.execute(
+            "SELECT value, fetched_at FROM cache WHERE namespace = ? AND key = ? AND fetched_at > ?",
+            (self.namespace, key, time.time() - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        value = json.loads(zlib.decompress(row[0]))
+        return (value if self.decode is None else self.decode(value)), row[1]
+
+    def _set(self, db: sqlite3.Connection, key: str, value: bytes, fetched_at: float, prune: bool):
+        db.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, fetched_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, value, fetched_at),
+        )
+        if prune:
+            db.execute("DELETE FROM cache WHERE namespace = ? AND fetched_at <= ?", (self.namespace, time.time() - self.ttl))
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = await self.store.run(self._get, key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def set(self, key: str, value: Any, fetched_at: Optional[float] = None):
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        self._writes += 1
+        if self.encode is not None:
+            value = self.encode(value)
+        payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+        await self.store.run(self._set, key, payload, fetched_at, self._writes % self.PRUNE_INTERVAL == 0)
+
+    async def delete(self, key: str):
+        await self.store.run(lambda db: db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)))
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredBackend(CacheBackend):
+    """An in-memory tier in front of a slower shared backend.
+
+    Reads try memory first and copy persistent hits into memory; writes go to both.
+    """
+
+    def __init__(self, memory: CacheBackend, persistent: CacheBackend):
+        self.memory = memory
+        self.persistent = persistent
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = await self.memory.get(key)
+        if entry is None:
+            entry = await self.persistent.get(key)
+            if entry is not None:
+                await self.memory.set(key, *entry)
+        return entry
+
+    async def set(self, key: str, value: Any, fetched_at: Optional[float] = None):
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        await self.memory.set(key, value, fetched_at)
+        await self.persistent.set(key, value, fetched_at)
+
+    async def delete(self, key: str):
+        await self.memory.delete(key)
+        await self.persistent.delete(key)
+
+    def stats(self) -> dict:
+        return {"memory": self.memory.stats(), "persistent": self.persistent.stats()}
@@ -0,0 +1,150 @@
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from cache import TTLCache, MISSING
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+# Content codings we can produce, best first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Response types worth compressing
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best content coding allowed by an Accept-Encoding header, or None for identity."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+
+    for coding in ENCODINGS:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+class StreamCompressor:
+    """Compresses a streamed body chunk by chunk, flushing after every chunk
+    so each record reaches the client as soon as it is sent."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 16 + MAX_WBITS writes a gzip container
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+class CompressionMiddleware:
+    """Compresses JSON and text responses with the best coding the client accepts.
+
+    Bodies smaller than ``minimum_size`` are sent as they are; streamed bodies
+    are compressed as they go. Responses with an ETag are content-addressed, so
+    their compressed bodies are cached by ETag and coding, and their ETag is
+    sent weak since it now names the uncompressed data.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int, brotli_quality: int, cache_size: int, cache_ttl: float):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.bodies = TTLCache(cache_size, cache_ttl)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        start: Optional[Message] = None
+        compressor: Optional[StreamCompressor] = None
+
+        async def send_compressed(message: Message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # Hold the headers back until the first body chunk shows what to send
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is None:
+                # A later chunk of a streamed body
+                if compressor is not None:
+                    body = compressor.compress(body) if more_body else compressor.compress(body) + compressor.finish()
+                    message = {**message, "body": body}
+                await send(message)
+                return
+
+            initial, start = start, None
+            headers = MutableHeaders(raw=initial["headers"])
+            content_type = headers.get("Content-Type", "")
+            if "Content-Encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                await send(initial)
+                await send(message)
+                return
+
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is None or (not more_body and len(body) < self.minimum_size):
+                await send(initial)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            if more_body:
+                del headers["Content-Length"]
+                compressor = StreamCompressor(encoding, self.gzip_level, self.brotli_quality)
+                body = compressor.compress(body)
+            else:
+                body = self.compress_body(body, encoding, headers.get("ETag"))
+                headers["Content-Length"] = str(len(body))
+                if "ETag" in headers and not headers["ETag"].startswith("W/"):
+                    headers["ETag"] = "W/" + headers["ETag"]
+            await send(initial)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def compress_body(self, body: bytes, encoding: str, etag: Optional[str]) -> bytes:
+        if etag is None:
+            return compress(body, encoding, self.gzip_level, self.brotli_quality)
+        compressed = self.bodies.get((etag, encoding))
+        if compressed is MISSING:
+            compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            self.bodies.set((etag, encoding), compressed)
+        return compressed
@@ -0,0 +1,94 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    return value.lower() not in ("0", "false", "no", "off") if value else default
+
+
+# Upstream hosts
+HYPIXEL_API_URL = os.environ.get("HYPILITE_HYPIXEL_API_URL", "https://api.hypixel.net")
+MOJANG_API_URL = os.environ.get("HYPILITE_MOJANG_API_URL", "https://api.mojang.com")
+MOJANG_SESSION_URL = os.environ.get("HYPILITE_MOJANG_SESSION_URL", "https://sessionserver.mojang.com")
+
+# HTTP client pool
+HTTP_POOL_SIZE = _env_int("HYPILITE_HTTP_POOL_SIZE", 100)               # Total open connections
+HTTP_POOL_SIZE_PER_HOST = _env_int("HYPILITE_HTTP_POOL_SIZE_PER_HOST", 30)  # Open connections per upstream host
+HTTP_KEEPALIVE_TIMEOUT = _env_float("HYPILITE_HTTP_KEEPALIVE_TIMEOUT", 30.0)
+HTTP_CONNECT_TIMEOUT = _env_float("HYPILITE_HTTP_CONNECT_TIMEOUT", 5.0)
+
+# Upstream timeouts, retries and circuit breaking
+HYPIXEL_TIMEOUT = _env_float("HYPILITE_HYPIXEL_TIMEOUT", 10)    # Seconds per Hypixel request attempt
+MOJANG_TIMEOUT = _env_float("HYPILITE_MOJANG_TIMEOUT", 5)       # Seconds per Mojang request attempt
+HYPIXEL_RETRIES = _env_int("HYPILITE_HYPIXEL_RETRIES", 1)       # Retries after a timeout, connection error or 5xx
+MOJANG_RETRIES = _env_int("HYPILITE_MOJANG_RETRIES", 2)
+RETRY_BACKOFF = _env_float("HYPILITE_RETRY_BACKOFF", 0.2)       # Seconds; retries wait a random time up to this, doubling each retry
+RETRY_BACKOFF_MAX = _env_float("HYPILITE_RETRY_BACKOFF_MAX", 2)
+CIRCUIT_BREAKER_THRESHOLD = _env_int("HYPILITE_CIRCUIT_BREAKER_THRESHOLD", 5)  # Consecutive failures that open an upstream's circuit
+CIRCUIT_BREAKER_RESET = _env_float("HYPILITE_CIRCUIT_BREAKER_RESET", 30)       # Seconds between trial requests while open
+MOJANG_HEDGE_DELAY = _env_float("HYPILITE_MOJANG_HEDGE_DELAY", 0)  # Seconds before a slow Mojang lookup is raced by a second one; 0 disables
+STALE_IF_ERROR_TTL = _env_float("HYPILITE_STALE_IF_ERROR_TTL", 60 * 60)  # Seconds past the stale window cached players and guilds are served while Hypixel fails
+
+# Hypixel API key rate limiting
+HYPIXEL_RATE_LIMIT = _env_int("HYPILITE_HYPIXEL_RATE_LIMIT", 300)                     # Requests per key per window, until Hypixel's headers say otherwise
+HYPIXEL_RATE_LIMIT_WINDOW = _env_float("HYPILITE_HYPIXEL_RATE_LIMIT_WINDOW", 300)      # Seconds
+HYPIXEL_RATE_LIMIT_MAX_QUEUE = _env_int("HYPILITE_HYPIXEL_RATE_LIMIT_MAX_QUEUE", 50)   # Requests allowed to wait per key
+HYPIXEL_RATE_LIMIT_MAX_WAIT = _env_float("HYPILITE_HYPIXEL_RATE_LIMIT_MAX_WAIT", 10)   # Seconds a request may wait before it is shed
+
+# Hypixel API keys: cached data is only served without asking Hypixel to keys it
+# accepted recently; any other key is sent to Hypixel first
+API_KEY_CACHE_SIZE = _env_int("HYPILITE_API_KEY_CACHE_SIZE", 10_000)
+API_KEY_CACHE_TTL = _env_float("HYPILITE_API_KEY_CACHE_TTL", 300)  # Seconds an accepted key is trusted without asking Hypixel
+
+# Responses: serialize endpoint results straight to JSON with orjson instead of
+# re-validating them against their response models
+FAST_JSON = _env_bool("HYPILITE_FAST_JSON", True)
+
+# Request tracing: per-request spans reported in a Server-Timing header, and
+# logged for slow requests
+SERVER_TIMING = _env_bool("HYPILITE_SERVER_TIMING", True)
+SLOW_REQUEST_THRESHOLD = _env_float("HYPILITE_SLOW_REQUEST_THRESHOLD", 5)  # Seconds; 0 disables the slow request log
+
+# Response compression (gzip, and brotli when the brotli package is installed)
+COMPRESSION_MIN_SIZE = _env_int("HYPILITE_COMPRESSION_MIN_SIZE", 1024)  # Smaller bodies are sent uncompressed
+GZIP_LEVEL = _env_int("HYPILITE_GZIP_LEVEL", 6)                         # 1 (fastest) to 9 (smallest)
+BROTLI_QUALITY = _env_int("HYPILITE_BROTLI_QUALITY", 5)                 # 0 (fastest) to 11 (smallest)
+COMPRESSION_CACHE_SIZE = _env_int("HYPILITE_COMPRESSION_CACHE_SIZE", 1_000)  # Compressed bodies kept by ETag
+
+# Cache storage: "memory" (per worker), or "sqlite" (an in-memory tier in front of
+# a SQLite file that survives restarts and is shared by workers on the same host)
+CACHE_BACKEND = os.environ.get("HYPILITE_CACHE_BACKEND", "memory")
+CACHE_PATH = os.environ.get("HYPILITE_CACHE_PATH", "hypilite_cache.sqlite3")
+
+# Mojang name <-> UUID cache
+MOJANG_CACHE_SIZE = _env_int("HYPILITE_MOJANG_CACHE_SIZE", 50_000)
+MOJANG_CACHE_TTL = _env_float("HYPILITE_MOJANG_CACHE_TTL", 6 * 60 * 60)
+MOJANG_NEGATIVE_CACHE_TTL = _env_float("HYPILITE_MOJANG_NEGATIVE_CACHE_TTL", 5 * 60)  # "Not found" answers
+MOJANG_BATCH_WINDOW = _env_float("HYPILITE_MOJANG_BATCH_WINDOW", 0.01)  # Seconds username lookups wait to be sent together
+MOJANG_BATCH_SIZE = _env_int("HYPILITE_MOJANG_BATCH_SIZE", 10)         # Usernames per bulk request (Mojang allows 10)
+
+# Hypixel player cache (compact PlayerRecords built from /v2/player documents)
+PLAYER_CACHE_SIZE = _env_int("HYPILITE_PLAYER_CACHE_SIZE", 5_000)
+PLAYER_CACHE_TTL = _env_float("HYPILITE_PLAYER_CACHE_TTL", 60)  # Seconds a cached player is considered fresh
+PLAYER_CACHE_STALE_TTL = _env_float("HYPILITE_PLAYER_CACHE_STALE_TTL", 300)  # Seconds after that it is served while refreshing
+
+# Guilds
+GUILD_CACHE_SIZE = _env_int("HYPILITE_GUILD_CACHE_SIZE", 2_000)
+GUILD_CACHE_TTL = _env_float("HYPILITE_GUILD_CACHE_TTL", 60)  # Seconds a guild document is considered fresh
+GUILD_CACHE_STALE_TTL = _env_float("HYPILITE_GUILD_CACHE_STALE_TTL", 300)  # Seconds after that it is served while refreshing
+GUILD_INDEX_SIZE = _env_int("HYPILITE_GUILD_INDEX_SIZE", 100_000)  # Players and guild names mapped to their guild
+GUILD_MEMBER_CONCURRENCY = _env_int("HYPILITE_GUILD_MEMBER_CONCURRENCY", 10)  # Parallel member username lookups
+
+# Batch player lookups
+BATCH_MAX_PLAYERS = _env_int("HYPILITE_BATCH_MAX_PLAYERS", 100)   # Players accepted per request
+BATCH_CONCURRENCY = _env_int("HYPILITE_BATCH_CONCURRENCY", 10)    # Players looked up in parallel
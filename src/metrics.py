@@ -0,0 +1,244 @@
+import bisect
+import math
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Seconds, from a cache hit to an upstream request that times out
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WAIT_BUCKETS = (0.0, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette adds the charset
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self, name: str, labels: Labels) -> Iterator[Sample]:
+        yield name, labels, self.value
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # One count per bucket plus +Inf; made cumulative when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: Labels) -> Iterator[Sample]:
+        total = 0
+        for bound, count in zip((*self.buckets, math.inf), self.counts):
+            total += count
+            yield f"{name}_bucket", labels + (("le", _format_value(bound)),), total
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, total
+
+
+class Metric:
+    """A named metric with one value per combination of label values."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The value for these label values, created on first use."""
+        value = self._values.get(values)
+        if value is None:
+            value = self._values[values] = self._new_value()
+        return value
+
+    def samples(self) -> Iterator[Sample]:
+        for values, value in self._values.items():
+            yield from value.samples(self.name, tuple(zip(self.labelnames, values)))
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_value(self) -> _CounterValue:
+        return _CounterValue()
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def _new_value(self) -> _GaugeValue:
+        return _GaugeValue()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_value(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+
+class Snapshot(Metric):
+    """A metric read from counters kept elsewhere, built fresh at every scrape."""
+
+    def __init__(self, name: str, type: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+
+    def _new_value(self) -> _GaugeValue:
+        return _GaugeValue()
+
+    def add(self, value: float, *labelvalues: str):
+        self.labels(*labelvalues).set(value)
+
+
+class Registry:
+    """The metrics exposed at /metrics.
+
+    Hot-path metrics are updated as requests happen; collectors turn counters
+    other objects already keep (caches, the rate limiter) into metrics only
+    when scraped.
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[Metric]]):
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        metrics = list(self._metrics)
+        for collect in self._collectors:
+            metrics.extend(collect())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "hypilite_http_request_duration_seconds", "Time to answer HTTP requests, including streamed bodies.",
+    ("method", "route", "status"),
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge("hypilite_http_requests_in_flight", "HTTP requests being answered."))
+UPSTREAM_DURATION = REGISTRY.register(Histogram(
+    "hypilite_upstream_request_duration_seconds", "Time taken by each upstream request attempt, by status code, or timeout or connection error.",
+    ("upstream", "outcome"),
+))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "hypilite_upstream_errors_total", "Failed upstream request attempts, by reason: timeout, connection, a 5xx status code, or circuit_open.",
+    ("upstream", "reason"),
+))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge("hypilite_upstream_requests_in_flight", "Upstream request attempts in progress.", ("upstream",)))
+RATE_LIMIT_WAIT = REGISTRY.register(Histogram(
+    "hypilite_rate_limit_wait_seconds", "Time Hypixel requests waited for a rate limit token.", buckets=WAIT_BUCKETS,
+))
+
+
+class MetricsMiddleware:
+    """Times every HTTP request by method, route template and status code.
+
+    Routes are labelled by their path template (``/api/bedwars/{uuid}``), so
+    metrics stay bounded however many players are looked up; requests that
+    match no route are labelled ``unmatched``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: Dict[Callable, str] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status: Optional[int] = None
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels()
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            REQUEST_DURATION.labels(scope["method"], self._route(scope), str(status or 500)).observe(time.perf_counter() - started)
+
+    def _route(self, scope: Scope) -> str:
+        # The router records the matched endpoint in the scope it is given
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            self._route_paths = {
+                route.endpoint: route.path for route in scope["router"].routes if hasattr(route, "endpoint")
+            }
+            path = self._route_paths.get(endpoint, "unmatched")
+        return path
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal
+import config
+
+class PlayersRequest(BaseModel):
+    players: List[str] = Field(..., min_items=1, max_items=config.BATCH_MAX_PLAYERS, description="UUIDs (with or without dashes) or usernames")
+    fields: List[Literal["profile", "bedwars", "guild"]] = Field(["profile"], min_items=1)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "players": ["sheepie20", "0937b604c1ce446a96ff818d752a19f6"],
+                "fields": ["profile", "bedwars"]
+            }
+        }
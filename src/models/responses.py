@@ -32,20 +32,21 @@ class GuildMemberInfo(BaseModel):
     role: str
 
 class GuildData(BaseModel):
-    uuid: str
-    username: str
+    # Only in_guild is set for players without a guild
+    uuid: Optional[str]
+    username: Optional[str]
     in_guild: bool
-    name: str
+    name: Optional[str]
     tag: Optional[str]
     tag_color: Optional[str]
-    exp: int
-    created: int
-    created_pretty: str
-    quests: int
-    joined: int
-    joined_pretty: str
-    weekly_exp: int
-    members: List[GuildMemberInfo]
+    exp: Optional[int]
+    created: Optional[int]
+    created_pretty: Optional[str]
+    quests: Optional[int]
+    joined: Optional[int]
+    joined_pretty: Optional[str]
+    weekly_exp: Optional[int]
+    members: Optional[List[GuildMemberInfo]]
 
 class GuildResponse(BaseModel):
     success: bool
@@ -84,6 +85,47 @@ class GuildResponse(BaseModel):
             }
         }
 
+class GuildDetails(BaseModel):
+    id: str
+    name: str
+    tag: str
+    tag_color: str
+    exp: int
+    created: int
+    created_pretty: str
+    members: List[GuildMemberInfo]
+
+class GuildDetailsResponse(BaseModel):
+    success: bool
+    data: GuildDetails
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "data": {
+                    "id": "6647bd04c8f8e3bc1ab7e4c5",
+                    "name": "TheWaffleCult",
+                    "tag": "WAFFLE",
+                    "tag_color": "GOLD",
+                    "exp": 19606242,
+                    "created": 1715983620704,
+                    "created_pretty": "2024-05-17 22:07:00",
+                    "members": [{
+                        "uuid": "0937b604c1ce446a96ff818d752a19f6",
+                        "username": "sheepie20",
+                        "joined": 1719092290705,
+                        "joined_pretty": "2024-06-22 21:38:10",
+                        "quests": 0,
+                        "rank": "Member",
+                        "weekly_exp": 0,
+                        "daily_exp": 0,
+                        "role": "Member"
+                    }]
+                }
+            }
+        }
+
 class PlayerImages(BaseModel):
     full_skin_image: str
     three_d_head_image: str = Field(alias="3d_head_image")
@@ -357,16 +399,17 @@ class BedwarsStats(BaseModel):
         }
 
 class BedwarsData(BaseModel):
+    # Sections left out with ?fields= are omitted from the response
     uuid: str
     username: str
-    xp: int
-    level: float
-    prestige: int
-    next_level: int
-    xp_to_next_level: int
-    progress_to_next_level_percentage: int
-    resources: BedwarsResources
-    stats: BedwarsStats
+    xp: Optional[int]
+    level: Optional[float]
+    prestige: Optional[int]
+    next_level: Optional[int]
+    xp_to_next_level: Optional[int]
+    progress_to_next_level_percentage: Optional[int]
+    resources: Optional[BedwarsResources]
+    stats: Optional[BedwarsStats]
 
 class BedwarsResponse(BaseModel):
     success: bool
@@ -451,6 +494,51 @@ class BedwarsResponse(BaseModel):
             }
         }
 
+class BatchError(BaseModel):
+    status_code: int
+    detail: str
+
+class PlayerBatchData(BaseModel):
+    profile: Optional[PlayerProfileData] = None
+    bedwars: Optional[BedwarsData] = None
+    guild: Optional[GuildData] = None
+
+class PlayerBatchResult(BaseModel):
+    player: str
+    uuid: Optional[str] = None
+    success: bool
+    data: PlayerBatchData
+    errors: Dict[str, BatchError] = {}
+
+class PlayersResponse(BaseModel):
+    success: bool
+    data: List[PlayerBatchResult]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "data": [{
+                    "player": "sheepie20",
+                    "uuid": "0937b604c1ce446a96ff818d752a19f6",
+                    "success": False,
+                    "data": {
+                        "profile": {
+                            "uuid": "0937b604c1ce446a96ff818d752a19f6",
+                            "username": "sheepie20",
+                            "rank": "MVP+"
+                        }
+                    },
+                    "errors": {
+                        "bedwars": {
+                            "status_code": 404,
+                            "detail": "BedWars data not found"
+                        }
+                    }
+                }]
+            }
+        }
+
 class ErrorResponse(BaseModel):
     detail: str
 
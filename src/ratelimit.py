@@ -0,0 +1,147 @@
+import asyncio
+import math
+import time
+from typing import Mapping, Optional
+from fastapi import HTTPException, status
+from cache import TTLCache, MISSING
+from metrics import RATE_LIMIT_WAIT
+from tracing import span
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Paces requests made with one Hypixel API key.
+
+    Starts from the configured quota and corrects itself from the
+    ``RateLimit-*`` headers Hypixel sends back with every response. Tokens are
+    reserved when a request is queued, so queued requests go out in order and
+    the balance can go negative while requests wait.
+    """
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / self.window)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens * self.window / self.limit if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def delay(self) -> float:
+        """Seconds a new request would have to wait, without taking a token."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = (1 - self.tokens) * self.window / self.limit if self.tokens < 1 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def update(self, limit: Optional[int], remaining: Optional[int], reset: Optional[int]):
+        """Correct the bucket from Hypixel's RateLimit-Limit/Remaining/Reset headers."""
+        now = time.monotonic()
+        self._refill(now)
+        if limit:
+            self.limit = limit
+        if remaining is not None:
+            # Requests still queued here will also use up Hypixel's remaining quota
+            self.tokens = min(self.tokens, remaining - self.waiting)
+            if remaining == 0 and reset:
+                self.blocked_until = now + reset
+
+
+class RateLimiter:
+    """Token-bucket governor with one bucket per Hypixel API key.
+
+    Requests wait for a token before going upstream. When the queue for a key
+    is full, or the wait would be too long, the request is shed with a 429 and
+    a Retry-After header instead of being sent to Hypixel.
+    """
+
+    def __init__(self, limit: int, window: float, max_queue: int, max_wait: float):
+        self.limit = limit
+        self.window = window
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._buckets = TTLCache(10_000, ttl=max(window * 2, 60 * 60))
+        self.requests = 0
+        self.delayed = 0
+        self.shed = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is MISSING:
+            bucket = TokenBucket(self.limit, self.window)
+        self._buckets.set(key, bucket)
+        return bucket
+
+    async def acquire(self, key: str):
+        """Wait until a request may be sent with ``key``.
+
+        Raises:
+            HTTPException: 429 if the request is shed because the key's queue is full
+        """
+        bucket = self._bucket(key)
+        self.requests += 1
+
+        delay = bucket.delay()
+        if delay > 0 and (bucket.waiting >= self.max_queue or delay > self.max_wait):
+            self.shed += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(math.ceil(delay))}
+            )
+
+        wait = bucket.reserve()
+        RATE_LIMIT_WAIT.labels().observe(max(0.0, wait))
+        if wait <= 0:
+            return
+
+        self.delayed += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+        bucket.waiting += 1
+        try:
+            with span("ratelimit"):
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # Give the reserved token back
+            bucket.tokens += 1
+            raise
+        finally:
+            bucket.waiting -= 1
+
+    def update(self, key: str, headers: Mapping[str, str]):
+        """Learn the key's real quota from a Hypixel response's headers."""
+        self._bucket(key).update(
+            _header_int(headers, "RateLimit-Limit"),
+            _header_int(headers, "RateLimit-Remaining"),
+            _header_int(headers, "RateLimit-Reset"),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._buckets),
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "shed": self.shed,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_max": round(self.wait_seconds_max, 3),
+        }
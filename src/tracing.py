@@ -0,0 +1,187 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, Iterator, List, Optional
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("hypilite")
+
+
+class Span:
+    """A timed step of a request."""
+    __slots__ = ("name", "parent", "start", "end", "detail")
+
+    def __init__(self, name: str, parent: Optional["Span"], start: float):
+        self.name = name
+        self.parent = parent
+        self.start = start
+        self.end = start
+        self.detail: Optional[str] = None  # e.g. the status code of an upstream response
+
+
+class Trace:
+    """The spans recorded while answering one request.
+
+    Keeps the total time and count per span name for the Server-Timing header,
+    and the spans themselves (up to ``MAX_SPANS``) for slow request logs.
+    """
+
+    MAX_SPANS = 1_000
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.totals: Dict[str, List[float]] = {}  # name -> [seconds, count]
+        self.returned_at: Optional[float] = None  # When the endpoint returned data for FastAPI to validate
+
+    def add(self, span: Span):
+        total = self.totals.get(span.name)
+        if total is None:
+            total = self.totals[span.name] = [0.0, 0]
+        total[0] += span.end - span.start
+        total[1] += 1
+        if len(self.spans) < self.MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def server_timing(self) -> str:
+        """A Server-Timing header value: the total time, then the summed time of each kind of span.
+
+        Spans that ran in parallel (such as the username lookups for a guild's
+        members) are summed, so their time can add up to more than the total.
+        """
+        metrics = [f"total;dur={1000 * (time.perf_counter() - self.start):.1f}"]
+        for name, (seconds, count) in self.totals.items():
+            metric = f"{name};dur={1000 * seconds:.1f}"
+            if count > 1:
+                metric += f';desc="{count} spans"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+    def format_tree(self) -> str:
+        """The spans as an indented tree, each with its start offset and duration in milliseconds."""
+        kept = set(self.spans)
+        children: Dict[Optional[Span], List[Span]] = {}
+        for span in sorted(self.spans, key=lambda span: span.start):
+            # Spans whose parent was not kept, or has not ended, are shown at the top level
+            parent = span.parent if span.parent in kept else None
+            children.setdefault(parent, []).append(span)
+
+        lines = []
+
+        def walk(parent: Optional[Span], depth: int):
+            for span in children.get(parent, ()):
+                detail = f" ({span.detail})" if span.detail else ""
+                lines.append(
+                    f"{'  ' * depth}+{1000 * (span.start - self.start):.1f}ms "
+                    f"{span.name} {1000 * (span.end - span.start):.1f}ms{detail}"
+                )
+                walk(span, depth + 1)
+
+        walk(None, 1)
+        if self.dropped:
+            lines.append(f"  ... {self.dropped} more spans not kept")
+        return "\n".join(lines)
+
+
+_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("hypilite_trace", default=None)
+_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("hypilite_span", default=None)
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[Optional[Span]]:
+    """Time a step of the current request; yields None outside a request.
+
+    Tasks started inside the block inherit it as their parent span.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+
+    current = Span(name, _span.get(), time.perf_counter())
+    token = _span.set(current)
+    try:
+        yield current
+    finally:
+        _span.reset(token)
+        current.end = time.perf_counter()
+        trace.add(current)
+
+
+class TimingMiddleware:
+    """Traces each HTTP request, reports its spans in a Server-Timing header,
+    and logs the span tree of requests slower than ``slow_threshold`` seconds.
+
+    The header is sent with the response headers, so spans that end while a
+    body is streamed only show up in the slow request log.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool, slow_threshold: float):
+        self.app = app
+        self.server_timing = server_timing
+        self.slow_threshold = slow_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _trace.set(trace)
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                MutableHeaders(raw=message["headers"]).append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _trace.reset(token)
+            elapsed = time.perf_counter() - trace.start
+            if self.slow_threshold and elapsed >= self.slow_threshold:
+                # Only the path: the query string carries the API key
+                logger.warning(
+                    "Slow request: %s %s took %.1fms\n%s",
+                    scope["method"], scope["path"], 1000 * elapsed, trace.format_tree(),
+                )
+
+
+class TimedRoute(APIRoute):
+    """A route that records FastAPI's response model validation as a ``validation`` span.
+
+    Endpoints returning a Response themselves skip validation, and get no span.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            async def timed_call(**values: Any) -> Any:
+                result = await call(**values)
+                trace = _trace.get()
+                if trace is not None and not isinstance(result, Response):
+                    trace.returned_at = time.perf_counter()
+                return result
+            self.dependant.call = timed_call
+
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            response = await handler(request)
+            trace = _trace.get()
+            if trace is not None and trace.returned_at is not None:
+                validation = Span("validation", None, trace.returned_at)
+                validation.end = time.perf_counter()
+                trace.add(validation)
+            return response
+
+        return timed_handler
@@ -0,0 +1,192 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, List, Mapping, NamedTuple, Optional
+import aiohttp
+import orjson
+from metrics import UPSTREAM_DURATION, UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT
+from tracing import span
+
+
+class UpstreamError(Exception):
+    """An upstream could not be reached: its circuit is open, or every attempt failed."""
+
+
+class UpstreamResponse(NamedTuple):
+    """A fully read upstream response."""
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        """Decode the body with orjson, straight from the raw bytes."""
+        return orjson.loads(self.body)
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after ``threshold`` consecutive failures.
+
+    While open, calls fail fast. Every ``reset_timeout`` seconds one trial call
+    is let through (half-open): success closes the circuit, failure keeps it
+    open. A trial that never reports back, e.g. because it was cancelled, just
+    waits for the next one.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may be made now."""
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_timeout:
+            # Let this call through as the trial, and hold the next one back
+            self.opened_at = now
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class Upstream:
+    """Makes requests to one upstream API with a timeout, retries and a circuit breaker.
+
+    Timeouts, connection errors and 5xx responses are retried up to ``retries``
+    times with full-jitter exponential backoff, and count as failures for the
+    circuit breaker. With ``hedge_delay`` set, hedged requests that have not
+    answered after that many seconds are raced against a second identical
+    request; only hedge idempotent requests.
+    """
+
+    def __init__(self, name: str, session: Callable[[], aiohttp.ClientSession], timeout: aiohttp.ClientTimeout,
+                 retries: int, backoff: float, backoff_max: float, breaker: CircuitBreaker, hedge_delay: float = 0):
+        self.name = name
+        self.session = session
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+        self.hedge_delay = hedge_delay
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.hedged = 0
+        self.rejected = 0
+
+    async def request(self, method: str, url: str, before_attempt: Optional[Callable[[], Awaitable[Any]]] = None,
+                      hedge: bool = False, **kwargs: Any) -> UpstreamResponse:
+        """Send a request, retrying transient failures.
+
+        Args:
+            method (str): HTTP method
+            url (str): Full URL
+            before_attempt: Coroutine function awaited before every attempt, e.g. to take a rate limit token
+            hedge (bool): Race slow attempts against a second request, if ``hedge_delay`` is set
+            **kwargs: Passed on to ``aiohttp.ClientSession.request``
+
+        Returns:
+            UpstreamResponse: The response; after the last retry this may still be a 5xx
+
+        Raises:
+            UpstreamError: If the circuit is open or every attempt timed out or failed to connect
+        """
+        self.requests += 1
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                UPSTREAM_ERRORS.labels(self.name, "circuit_open").inc()
+                raise UpstreamError(f"{self.name} is unavailable")
+            if attempt:
+                self.retried += 1
+            if before_attempt is not None:
+                await before_attempt()
+
+            in_flight = UPSTREAM_IN_FLIGHT.labels(self.name)
+            in_flight.inc()
+            started = time.perf_counter()
+            response: Optional[UpstreamResponse] = None
+            error: Optional[Exception] = None
+            with span(f"upstream.{self.name}") as attempt_span:
+                try:
+                    if hedge and self.hedge_delay > 0:
+                        response = await self._hedged(method, url, **kwargs)
+                    else:
+                        response = await self._send(method, url, **kwargs)
+                    outcome = str(response.status)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    error = exc
+                    outcome = "timeout" if isinstance(exc, asyncio.TimeoutError) else "connection"
+                finally:
+                    in_flight.dec()
+                if attempt_span is not None:
+                    attempt_span.detail = outcome
+            UPSTREAM_DURATION.labels(self.name, outcome).observe(time.perf_counter() - started)
+
+            if error is None and response.status < 500:
+                self.breaker.record_success()
+                return response
+            UPSTREAM_ERRORS.labels(self.name, outcome).inc()
+            self.failures += 1
+            self.breaker.record_failure()
+            if attempt == self.retries:
+                if error is not None:
+                    raise UpstreamError(f"{self.name} request failed: {error!r}") from error
+                return response
+
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+
+    async def _send(self, method: str, url: str, **kwargs: Any) -> UpstreamResponse:
+        async with self.session().request(method, url, timeout=self.timeout, **kwargs) as resp:
+            return UpstreamResponse(resp.status, resp.headers, await resp.read())
+
+    async def _hedged(self, method: str, url: str, **kwargs: Any) -> UpstreamResponse:
+        tasks: List[asyncio.Future] = [asyncio.ensure_future(self._send(method, url, **kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                self.hedged += 1
+                tasks.append(asyncio.ensure_future(self._send(method, url, **kwargs)))
+
+            # Use whichever request answers first; if one fails, wait for the other
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retried": self.retried,
+            "failures": self.failures,
+            "hedged": self.hedged,
+            "rejected": self.rejected,
+            "circuit": self.breaker.state,
+        }
@@ -1,22 +1,264 @@
 import aiohttp
+import asyncio
 from fastapi import HTTPException
 from fastapi import status
+from bisect import bisect_right
 from datetime import datetime
+from itertools import accumulate
+from urllib.parse import quote
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+import hashlib
+import logging
+import math
+import re
 import time
+import numpy as np
+import config
+from cache import Cached, CacheBackend, MemoryBackend, SQLiteBackend, SQLiteStore, TieredBackend, SingleFlight, MISSING
+from ratelimit import RateLimiter
+from upstream import CircuitBreaker, Upstream, UpstreamError
+from tracing import span
 
-async def get_rank(uuid: str, data: dict):
-    uuid = str(uuid).strip("-")
-    if not data or "player" not in data:
-        return ""
+logger = logging.getLogger("hypilite")
 
-    player = data["player"]
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the shared HTTP client used for every upstream call.
+
+    The session keeps a keep-alive connection pool per upstream host, so
+    requests reuse open TCP/TLS connections instead of handshaking each time.
+    It is normally created at app startup, but is created lazily if needed.
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_POOL_SIZE,
+            limit_per_host=config.HTTP_POOL_SIZE_PER_HOST,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        # Timeouts are set per upstream, on every request (see _upstream)
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+# Shared on-disk store behind every cache when HYPILITE_CACHE_BACKEND=sqlite
+_sqlite_store = SQLiteStore(config.CACHE_PATH) if config.CACHE_BACKEND == "sqlite" else None
+
+def create_cache(namespace: str, maxsize: int, ttl: float,
+                 encode: Optional[Callable[[Any], Any]] = None, decode: Optional[Callable[[Any], Any]] = None) -> CacheBackend:
+    """Create the cache for one kind of upstream document using the configured backend.
+    
+    Args:
+        namespace (str): Name of the document kind, used to separate entries in shared stores
+        maxsize (int): Maximum number of entries kept in memory
+        ttl (float): Seconds entries are retained
+        encode: Turns a value into JSON-serializable data for persistent stores; values are stored as they are by default
+        decode: Turns what ``encode`` returned back into the value
+    
+    Returns:
+        CacheBackend: An in-memory cache, or an in-memory tier in front of SQLite
+    """
+    memory = MemoryBackend(maxsize, ttl)
+    if config.CACHE_BACKEND == "memory":
+        return memory
+    if config.CACHE_BACKEND == "sqlite":
+        return TieredBackend(memory, SQLiteBackend(_sqlite_store, namespace, ttl, encode, decode))
+    raise ValueError(f"Unknown cache backend: {config.CACHE_BACKEND}")
+
+def _upstream(name: str, timeout: float, retries: int, hedge_delay: float = 0) -> Upstream:
+    return Upstream(
+        name, get_session,
+        aiohttp.ClientTimeout(total=timeout, connect=config.HTTP_CONNECT_TIMEOUT),
+        retries, config.RETRY_BACKOFF, config.RETRY_BACKOFF_MAX,
+        CircuitBreaker(config.CIRCUIT_BREAKER_THRESHOLD, config.CIRCUIT_BREAKER_RESET),
+        hedge_delay,
+    )
+
+# Each upstream host gets its own timeout, retries and circuit breaker
+_hypixel = _upstream("hypixel", config.HYPIXEL_TIMEOUT, config.HYPIXEL_RETRIES)
+_mojang_api = _upstream("mojang_api", config.MOJANG_TIMEOUT, config.MOJANG_RETRIES, config.MOJANG_HEDGE_DELAY)
+_mojang_session = _upstream("mojang_session", config.MOJANG_TIMEOUT, config.MOJANG_RETRIES, config.MOJANG_HEDGE_DELAY)
+
+def _unavailable(upstream: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"{upstream} API unavailable"
+    )
+
+# Mojang name <-> UUID cache. Both directions are filled from every successful
+# lookup, and "not found" answers are only trusted for a shorter time.
+NOT_FOUND = "not found"
+_username_cache = create_cache("mojang_usernames", config.MOJANG_CACHE_SIZE, config.MOJANG_CACHE_TTL)  # uuid -> username
+_uuid_cache = create_cache("mojang_uuids", config.MOJANG_CACHE_SIZE, config.MOJANG_CACHE_TTL)          # lowercase username -> uuid
+
+async def _get_cached_name(cache: CacheBackend, key: str) -> Any:
+    entry = await cache.get(key)
+    if entry is None:
+        return MISSING
+    value, fetched_at = entry
+    max_age = config.MOJANG_NEGATIVE_CACHE_TTL if value == NOT_FOUND else config.MOJANG_CACHE_TTL
+    return value if time.time() - fetched_at < max_age else MISSING
+
+async def _remember_name(uuid: str, username: str):
+    await _username_cache.set(uuid, username)
+    await _uuid_cache.set(username.lower(), uuid)
+
+# PlayerRecords built from Hypixel /v2/player documents, by UUID, shared by every
+# endpoint that needs them
+_player_cache = create_cache(
+    "player_records", config.PLAYER_CACHE_SIZE, config.PLAYER_CACHE_TTL + config.PLAYER_CACHE_STALE_TTL + config.STALE_IF_ERROR_TTL,
+    encode=lambda record: record.to_dict(), decode=lambda data: PlayerRecord.from_dict(data),
+)
+
+# Hypixel /v2/guild documents by guild ID, shared by every member of the guild
+_guild_cache = create_cache("guilds", config.GUILD_CACHE_SIZE, config.GUILD_CACHE_TTL + config.GUILD_CACHE_STALE_TTL + config.STALE_IF_ERROR_TTL)
+
+# Guild IDs by "player:{uuid}" and "name:{lowercase name}", pointing lookups at the
+# cached guild document. NO_GUILD records players (and names) without a guild.
+_guild_index = create_cache("guild_index", config.GUILD_INDEX_SIZE, config.GUILD_CACHE_TTL + config.GUILD_CACHE_STALE_TTL + config.STALE_IF_ERROR_TTL)
+NO_GUILD = ""
+
+# When Hypixel last answered a request for each API key, by a hash of the key so
+# keys are never written to the persistent store. Cached player and guild data is
+# only served without asking Hypixel to keys accepted within API_KEY_CACHE_TTL,
+# so an invalid key cannot read the cache. Keys are remembered for as long as
+# cached data may be served while Hypixel fails, so keys that were working keep
+# getting stale data through an outage, and across a restart with SQLite.
+_accepted_keys = create_cache(
+    "accepted_api_keys", config.API_KEY_CACHE_SIZE,
+    max(
+        config.API_KEY_CACHE_TTL,
+        config.PLAYER_CACHE_TTL + config.PLAYER_CACHE_STALE_TTL,
+        config.GUILD_CACHE_TTL + config.GUILD_CACHE_STALE_TTL,
+    ) + config.STALE_IF_ERROR_TTL,
+)
+
+def _key_id(api_key: str) -> str:
+    return hashlib.blake2b(api_key.encode(), digest_size=16).hexdigest()
+
+async def _accepted_key_age(api_key: str) -> Optional[float]:
+    """Seconds since Hypixel last accepted ``api_key``, or None if it has not."""
+    entry = await _accepted_keys.get(_key_id(api_key))
+    return None if entry is None else max(0.0, time.time() - entry[1])
+
+# Concurrent requests for the same upstream resource share one in-flight fetch.
+# Keys are (resource, id) tuples, e.g. ("uuid", username). Hypixel fetches add
+# the API key, ("player", uuid, api_key), so a key's errors (an invalid key, its
+# rate limit) and its rate limit tokens are never shared with other keys.
+_inflight = SingleFlight()
+
+# Background refreshes of stale cache entries by (resource, id), kept so they are
+# not garbage collected. One refresh per resource runs at a time, whatever the
+# API key: refresh errors only reach the log, never a caller.
+_refreshes: Dict[Tuple[str, str], asyncio.Task] = {}
+
+async def read_through(cache: CacheBackend, resource: str, key: str, api_key: str, fresh_for: float, stale_for: float,
+                       fetch: Callable[..., Awaitable[Any]], *args: Any) -> Cached:
+    """Read ``key`` through ``cache`` with stale-while-revalidate.
+    
+    Entries younger than ``fresh_for`` seconds are returned as they are. Entries up to
+    ``stale_for`` seconds past that are returned immediately while ``fetch(*args)``
+    refreshes them in the background, at most once per key at a time. Anything
+    older is fetched before returning, unless the fetch fails with a 5xx: then
+    whatever the cache still holds (see ``STALE_IF_ERROR_TTL``) is served stale
+    instead. ``fetch`` is expected to store what it fetched. API keys Hypixel has
+    not accepted within ``API_KEY_CACHE_TTL`` always fetch, so Hypixel validates
+    them; only keys it accepted before are served stale when that fetch fails.
     
+    Args:
+        cache (CacheBackend): The cache to read
+        resource (str): Kind of resource, used to share in-flight fetches
+        key (str): The cache key
+        api_key (str): The Hypixel API key ``fetch`` sends; only fetches with the same key are shared
+        fresh_for (float): Seconds an entry is fresh
+        stale_for (float): Seconds past ``fresh_for`` an entry may still be served
+        fetch: Coroutine function fetching (and caching) the resource
+    
+    Returns:
+        Cached: The value with its age and cache status
+    """
+    flight_key = (resource, key, api_key)
+    key_age = await _accepted_key_age(api_key)
+    entry = await cache.get(key) if key_age is not None else None
+    if entry is not None:
+        value, fetched_at = entry
+        age = max(0.0, time.time() - fetched_at)
+        if key_age < config.API_KEY_CACHE_TTL:
+            if age < fresh_for:
+                return Cached(value, age, "hit")
+            if age < fresh_for + stale_for:
+                _refresh_in_background(flight_key, fetch, *args)
+                return Cached(value, age, "stale")
+
+    try:
+        value = await _inflight.do(flight_key, fetch, *args)
+    except HTTPException as exc:
+        # While the upstream is failing, an old answer beats an error
+        if entry is None or exc.status_code < 500:
+            raise
+        return Cached(entry[0], age, "stale")
+    return Cached(value, 0.0, "miss")
+
+def _refresh_in_background(flight_key: Tuple[str, str, str], fetch: Callable[..., Awaitable[Any]], *args: Any):
+    resource = flight_key[:2]  # Without the API key, which must not reach the log
+    if resource in _refreshes:
+        return
+
+    async def refresh():
+        try:
+            await _inflight.do(flight_key, fetch, *args)
+        except Exception as exc:
+            # The stale copy keeps being served until a refresh succeeds
+            logger.warning("Background refresh of %s failed: %r", resource, exc)
+
+    task = asyncio.ensure_future(refresh())
+    _refreshes[resource] = task
+    task.add_done_callback(lambda done: _refreshes.pop(resource, None))
+
+# Paces Hypixel requests per API key to stay inside each key's quota
+rate_limiter = RateLimiter(
+    config.HYPIXEL_RATE_LIMIT,
+    config.HYPIXEL_RATE_LIMIT_WINDOW,
+    max_queue=config.HYPIXEL_RATE_LIMIT_MAX_QUEUE,
+    max_wait=config.HYPIXEL_RATE_LIMIT_MAX_WAIT,
+)
+
+def upstream_stats() -> dict:
+    """Return request, retry and circuit breaker counters for each upstream."""
+    return {upstream.name: upstream.stats() for upstream in (_hypixel, _mojang_api, _mojang_session)}
+
+def cache_stats() -> dict:
+    """Return hit/miss counters for the caches."""
+    return {
+        "mojang_usernames": _username_cache.stats(),
+        "mojang_uuids": _uuid_cache.stats(),
+        "players": _player_cache.stats(),
+        "guilds": _guild_cache.stats(),
+        "guild_index": _guild_index.stats(),
+        "api_keys": _accepted_keys.stats(),
+    }
+
+async def close_caches():
+    """Close the persistent cache store, if one is in use."""
+    if _sqlite_store is not None:
+        await _sqlite_store.close()
+
+async def close_session():
+    """Close the shared HTTP client and its connection pool."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+# Minecraft formatting codes: a section sign followed by one character
+_FORMATTING_CODE = re.compile("§.?", re.DOTALL)
+
+def player_rank(player: dict) -> str:
+    """Return a player's rank as shown in game, from their /v2/player ``player`` object."""
     try:
         if player.get("prefix"):
-            prefix = player["prefix"]
-            while "§" in prefix:
-                idx = prefix.index("§")
-                prefix = prefix[:idx] + prefix[idx+2:]
+            prefix = _FORMATTING_CODE.sub("", player["prefix"])
             return prefix.strip().strip("[").strip("]") # example output: "PIG+++", "OWNER"
         if player.get("rank"):
             return player["rank"] # example output: "YOUTUBE"
@@ -58,31 +300,129 @@ async def get_username(uuid: str) -> str:
         HTTPException: If the UUID is invalid or the API request fails
     """
     # Remove dashes from UUID if present
-    uuid = str(uuid).replace("-", "")
-    
+    uuid = str(uuid).replace("-", "").lower()
+
+    cached = await _get_cached_name(_username_cache, uuid)
+    if cached == NOT_FOUND:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found"
+        )
+    if cached is not MISSING:
+        return cached
+
+    return await _inflight.do(("username", uuid), _fetch_username, uuid)
+
+async def _fetch_username(uuid: str) -> str:
     # Mojang API endpoint
-    url = f"https://sessionserver.mojang.com/session/minecraft/profile/{uuid}"
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status == 204:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Player not found"
-                )
-            elif resp.status == 400:
-                raise HTTPException(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    detail="Invalid UUID format"
-                )
-            elif resp.status != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Mojang API error"
-                )
-            
-            data = await resp.json()
-            return data.get("name", "not found")
+    url = f"{config.MOJANG_SESSION_URL}/session/minecraft/profile/{uuid}"
+    
+    try:
+        resp = await _mojang_session.request("GET", url, hedge=True)
+    except UpstreamError:
+        raise _unavailable("Mojang")
+
+    if resp.status == 204:
+        await _username_cache.set(uuid, NOT_FOUND)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found"
+        )
+    elif resp.status == 400:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid UUID format"
+        )
+    elif resp.status != 200:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Mojang API error"
+        )
+    
+    data = resp.json()
+    username = data.get("name", NOT_FOUND)
+    if username != NOT_FOUND:
+        await _remember_name(uuid, username)
+    return username
+
+async def resolve_uuid(username_or_uuid: str) -> str:
+    """Return the UUID for a username or UUID.
+    
+    Args:
+        username_or_uuid (str): A username, or a UUID with or without dashes
+    
+    Returns:
+        str: The UUID without dashes
+        
+    Raises:
+        HTTPException: If no player has that username
+    """
+    uuid = str(username_or_uuid).replace("-", "")
+    if len(uuid) == 32:
+        return uuid.lower()
+
+    uuid = await get_uuid(username_or_uuid)
+    if uuid == NOT_FOUND:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found"
+        )
+    return uuid
+
+async def map_as_completed(func: Callable[[Any], Awaitable[Any]], items: List[Any], concurrency: int) -> AsyncIterator[Tuple[int, Any]]:
+    """Await ``func`` over ``items`` with bounded concurrency.
+    
+    Args:
+        func: Coroutine function called with each item
+        items (List): The items to process
+        concurrency (int): Maximum number of calls in flight at once
+    
+    Yields:
+        Tuple[int, Any]: ``(index, result)`` pairs, as each call finishes
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, item: Any) -> Tuple[int, Any]:
+        async with semaphore:
+            return index, await func(item)
+
+    tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop outstanding calls if the consumer goes away early
+        for task in tasks:
+            task.cancel()
+
+async def _get_username_or_unknown(uuid: str) -> str:
+    try:
+        return await get_username(uuid)
+    except Exception:
+        return "Unknown"
+
+def iter_usernames(uuids: List[str], concurrency: int = config.GUILD_MEMBER_CONCURRENCY) -> AsyncIterator[Tuple[int, str]]:
+    """Resolve many UUIDs to usernames concurrently, yielding ``(index, username)`` as each resolves.
+    
+    UUIDs that could not be resolved yield "Unknown".
+    """
+    return map_as_completed(_get_username_or_unknown, uuids, concurrency)
+
+async def get_usernames(uuids: List[str], concurrency: int = config.GUILD_MEMBER_CONCURRENCY) -> List[str]:
+    """Resolve many UUIDs to usernames concurrently.
+    
+    Args:
+        uuids (List[str]): The UUIDs to convert
+        concurrency (int): Maximum number of lookups in flight at once
+    
+    Returns:
+        List[str]: The usernames in the same order as ``uuids``, with
+        "Unknown" for any UUID that could not be resolved
+    """
+    usernames = [None] * len(uuids)
+    async for index, username in iter_usernames(uuids, concurrency):
+        usernames[index] = username
+    return usernames
 
 def format_timestamp(timestamp: int) -> str:
     """Convert a Unix timestamp (milliseconds) to a human-readable date and time.
@@ -103,31 +443,575 @@ def format_timestamp(timestamp: int) -> str:
         return "Invalid timestamp"
 
 async def get_uuid(username: str):
+    cached = await _get_cached_name(_uuid_cache, username.lower())
+    if cached is not MISSING:
+        return cached
+
+    return await _inflight.do(("uuid", username.lower()), _uuid_batcher.resolve, username)
+
+async def _fetch_uuid(username: str) -> str:
     ts = time.time()
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"https://api.mojang.com/users/profiles/minecraft/{username}?at={ts}") as resp:
-            if resp.status != 200:
-                return "not found"
-            data = await resp.json()
-            uuid = data["id"]
-            return uuid
-
-async def get_user(uuid: str, token: str):
-    """Get user data from Hypixel API"""
-    uuid = uuid.strip("-")
+    try:
+        resp = await _mojang_api.request("GET", f"{config.MOJANG_API_URL}/users/profiles/minecraft/{username}?at={ts}", hedge=True)
+    except UpstreamError:
+        raise _unavailable("Mojang")
+
+    if resp.status in (204, 404):
+        await _uuid_cache.set(username.lower(), NOT_FOUND)
+        return NOT_FOUND
+    if resp.status != 200:
+        return NOT_FOUND
+    data = resp.json()
+    uuid = data["id"]
+    await _remember_name(uuid, data.get("name", username))
+    return uuid
+
+class UUIDBatcher:
+    """Resolves usernames to UUIDs with Mojang's bulk profiles endpoint.
+    
+    Lookups arriving within ``window`` seconds of each other are sent together,
+    ``batch_size`` names per request, so a lobby of 16 names costs 2 requests
+    instead of 16. Found names fill the name caches; missing ones are cached
+    as NOT_FOUND, like single lookups.
+    """
+
+    def __init__(self, window: float, batch_size: int):
+        self.window = window
+        self.batch_size = batch_size
+        self._pending: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def resolve(self, username: str) -> str:
+        """Queue ``username`` for the next bulk request and wait for its UUID, or NOT_FOUND."""
+        key = username.lower()
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = (username, asyncio.get_event_loop().create_future())
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_event_loop().call_later(self.window, self._flush)
+        return await pending[1]
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._resolve_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _resolve_batch(self, batch: Dict[str, Tuple[str, asyncio.Future]]):
+        try:
+            results = await self._fetch_batch([username for username, _ in batch.values()])
+        except Exception as exc:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for key, (_, future) in batch.items():
+            if not future.done():
+                future.set_result(results[key])
+
+    async def _fetch_batch(self, usernames: List[str]) -> Dict[str, str]:
+        """Look up ``usernames``, returning lowercase username -> UUID or NOT_FOUND."""
+        try:
+            resp = await _mojang_api.request("POST", f"{config.MOJANG_API_URL}/profiles/minecraft", json=usernames)
+        except UpstreamError:
+            raise _unavailable("Mojang")
+
+        if resp.status == 400:
+            # Mojang rejects the whole batch if any name is invalid; look them up one by one
+            uuids = await asyncio.gather(*(_fetch_uuid(username) for username in usernames))
+            return {username.lower(): uuid for username, uuid in zip(usernames, uuids)}
+        if resp.status != 200:
+            return {username.lower(): NOT_FOUND for username in usernames}
+        profiles = resp.json()
+
+        found = {profile["name"].lower(): profile for profile in profiles}
+        results = {}
+        for username in usernames:
+            profile = found.get(username.lower())
+            if profile is None:
+                await _uuid_cache.set(username.lower(), NOT_FOUND)
+                results[username.lower()] = NOT_FOUND
+            else:
+                await _remember_name(profile["id"], profile["name"])
+                results[username.lower()] = profile["id"]
+        return results
+
+# Batches concurrent username -> UUID lookups into bulk Mojang requests
+_uuid_batcher = UUIDBatcher(config.MOJANG_BATCH_WINDOW, config.MOJANG_BATCH_SIZE)
+
+async def hypixel_get(path: str, api_key: str) -> dict:
+    """Make a GET request to the Hypixel API.
+    
+    Waits for the key's rate limit before every attempt. Timeouts, connection
+    errors and 5xx responses are retried with backoff.
+    
+    Args:
+        path (str): The endpoint path including the query string (e.g. "/v2/player?uuid=...")
+        api_key (str): The Hypixel API key to send
+    
+    Returns:
+        dict: The decoded JSON response
+        
+    Raises:
+        HTTPException: If the API key or UUID is invalid, the key's rate limit is
+        reached, or the API request fails (503 if Hypixel is unreachable)
+    """
+    try:
+        resp = await _hypixel.request(
+            "GET", f"{config.HYPIXEL_API_URL}{path}", headers={"API-Key": api_key},
+            before_attempt=lambda: rate_limiter.acquire(api_key),
+        )
+    except UpstreamError:
+        raise _unavailable("Hypixel")
+
+    rate_limiter.update(api_key, resp.headers)
+    if resp.status == 429:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Hypixel API rate limit exceeded",
+            headers={"Retry-After": resp.headers.get("Retry-After") or resp.headers.get("RateLimit-Reset") or "60"}
+        )
+    if resp.status >= 500:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Hypixel API error"
+        )
+
+    with span("parse"):
+        data = resp.json()
+    
+    if resp.status == 401 or data == {"success": False, "cause": "Invalid API key"}:
+        await _accepted_keys.delete(_key_id(api_key))
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
+    elif resp.status == 422 or data == {"success":False,"cause":"Malformed UUID"}:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid UUID"
+        )
+    elif resp.status != 200:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Hypixel API error"
+        )
+    await _accepted_keys.set(_key_id(api_key), True)
+    return data
+
+# Slumber tickets each Bedwars slumber wallet holds; unknown wallets hold none
+SLUMBER_WALLET_CAPACITY = {
+    "MINI_WALLET": 25,
+    "LIGHT_SLUMBERS_WALLET": 99,
+    "LIGHT_IMPERIAL_WALLET": 500,
+    "EXPLORERS_WALLET": 5_000,
+    "HOTEL_STAFF_WALLET": 10_000,
+    "PLATINUM_MEMBERSHIP_WALLET": 100_000,
+}
+
+class PlayerRecord(NamedTuple):
+    """Everything the endpoints use from a /v2/player document, computed once per fetch.
+    
+    The player cache keeps these instead of the documents, which are often
+    hundreds of kilobytes, so endpoints only pick out fields. The Bedwars fields
+    are None for players without Bedwars stats.
+    """
+    displayname: str
+    rank: str
+    first_login: int
+    first_login_pretty: str
+    last_login: int
+    last_login_pretty: str
+    last_logout: int
+    last_logout_pretty: str
+    network_exp: int
+    network_level: float
+    karma: int
+    achievement_points: int
+    total_rewards: int
+    total_daily_rewards: int
+    reward_streak: int
+    reward_score: int
+    reward_high_score: int
+    most_recent_game: str
+    bedwars_counters: Optional[Tuple[int, ...]]  # From read_bedwars_counters
+    bedwars_xp: Optional[int]
+    bedwars_level: Optional[float]
+    bedwars_prestige: Optional[int]
+    bedwars_next_level: Optional[int]
+    bedwars_xp_to_next_level: Optional[int]
+    bedwars_progress: Optional[int]  # Percent through the current level
+    bedwars_tokens: Optional[int]
+    slumber_tickets: Optional[int]
+    slumber_tickets_max: Optional[int]
+    slumber_tickets_total: Optional[int]
+
+    @classmethod
+    def from_player(cls, player: dict) -> "PlayerRecord":
+        """Build the record from a /v2/player response's ``player`` object."""
+        first_login = player.get("firstLogin", 0)
+        last_login = player.get("lastLogin", 0)
+        last_logout = player.get("lastLogout", 0)
+        network_exp = player.get("networkExp", 0)
+        profile = dict(
+            displayname=player.get("displayname", "not found"),
+            rank=player_rank(player),
+            first_login=first_login,
+            first_login_pretty=format_timestamp(first_login),
+            last_login=last_login,
+            last_login_pretty=format_timestamp(last_login),
+            last_logout=last_logout,
+            last_logout_pretty=format_timestamp(last_logout),
+            network_exp=int(network_exp),
+            network_level=get_network_level(network_exp),
+            karma=player.get("karma", 0),
+            achievement_points=player.get("achievementPoints", 0),
+            total_rewards=player.get("totalRewards", 0),
+            total_daily_rewards=player.get("totalDailyRewards", 0),
+            reward_streak=player.get("rewardStreak", 0),
+            reward_score=player.get("rewardScore", 0),
+            reward_high_score=player.get("rewardHighScore", 0),
+            most_recent_game=player.get("mostRecentGameType", "unknown"),
+        )
+
+        bedwars_data = (player.get("stats") or {}).get("Bedwars")
+        if not bedwars_data:
+            return cls(**profile, **dict.fromkeys(cls._fields[len(profile):]))
+
+        xp = bedwars_data.get("Experience", 0)
+        level, prestige, xp_to_next_level, progress_percentage = get_level_info(xp)
+        slumber = bedwars_data.get("slumber", {})
+        return cls(
+            **profile,
+            bedwars_counters=read_bedwars_counters(bedwars_data),
+            bedwars_xp=int(xp),
+            bedwars_level=level,
+            bedwars_prestige=int(prestige),
+            bedwars_next_level=int(level) + 1,
+            bedwars_xp_to_next_level=int(xp_to_next_level),
+            bedwars_progress=int(progress_percentage),
+            bedwars_tokens=bedwars_data.get("coins", 0),
+            slumber_tickets=slumber.get("tickets", 0),
+            slumber_tickets_max=SLUMBER_WALLET_CAPACITY.get(slumber.get("bag_type"), 0),
+            slumber_tickets_total=slumber.get("total_tickets_earned", 0),
+        )
+
+    def to_dict(self) -> dict:
+        """A JSON-serializable form of the record, for persistent caches."""
+        return self._asdict()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlayerRecord":
+        counters = data["bedwars_counters"]
+        return cls(**{**data, "bedwars_counters": None if counters is None else tuple(counters)})
+
+async def get_player_entry(uuid: str, api_key: str) -> Cached:
+    """Get a player's PlayerRecord, reading through the player cache.
+    
+    Records are built from /v2/player and are fresh for ``PLAYER_CACHE_TTL`` seconds.
+    For ``PLAYER_CACHE_STALE_TTL`` seconds after that they are still served while
+    being refreshed in the background.
+    Concurrent calls for the same UUID and API key share a single upstream request.
+    
+    Args:
+        uuid (str): The player's UUID (with or without dashes)
+        api_key (str): The Hypixel API key used if the record must be fetched
+    
+    Returns:
+        Cached: The player's PlayerRecord, with its age and cache status
+        
+    Raises:
+        HTTPException: 404 if there is no such player, or if the API key or UUID
+        is invalid or the API request fails
+    """
+    uuid = str(uuid).replace("-", "").lower()
+    return await read_through(
+        _player_cache, "player", uuid, api_key,
+        config.PLAYER_CACHE_TTL, config.PLAYER_CACHE_STALE_TTL,
+        _fetch_player, uuid, api_key,
+    )
+
+async def get_player(uuid: str, api_key: str) -> PlayerRecord:
+    """Get a player's PlayerRecord; see ``get_player_entry``."""
+    return (await get_player_entry(uuid, api_key)).value
+
+async def _fetch_player(uuid: str, api_key: str) -> PlayerRecord:
+    data = await hypixel_get(f"/v2/player?uuid={uuid}", api_key)
+    # Only keep real players; errors and unknown UUIDs are always re-fetched
+    if not data.get("success", False):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found"
+        )
+    if not data.get("player"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player data not found"
+        )
+    # Only the record is kept; the parsed document is dropped as soon as it is built
+    with span("normalize"):
+        record = PlayerRecord.from_player(data["player"])
+    await _player_cache.set(uuid, record)
+    return record
+
+async def get_guild_entry(guild_id: str, api_key: str) -> Cached:
+    """Get a guild's /v2/guild document by guild ID, reading through the guild cache.
+    
+    Documents are fresh for ``GUILD_CACHE_TTL`` seconds, then served stale for up to
+    ``GUILD_CACHE_STALE_TTL`` seconds while being refreshed in the background.
+    Concurrent calls for the same guild and API key share a single upstream request.
+    
+    Args:
+        guild_id (str): The guild's ID
+        api_key (str): The Hypixel API key used if the document must be fetched
+    
+    Returns:
+        Cached: The Hypixel response, with "guild" set to None if there is no
+        such guild, with its age and cache status
+        
+    Raises:
+        HTTPException: If the API key is invalid or the API request fails
+    """
+    guild_id = guild_id.lower()
+    return await read_through(
+        _guild_cache, "guild", guild_id, api_key,
+        config.GUILD_CACHE_TTL, config.GUILD_CACHE_STALE_TTL,
+        _fetch_guild_by_id, guild_id, api_key,
+    )
+
+async def get_guild_entry_by_name(name: str, api_key: str) -> Cached:
+    """Get the /v2/guild document for the guild called ``name``; see ``get_guild_entry``."""
+    return await _get_indexed_guild_entry(f"name:{name.lower()}", f"name={quote(name)}", api_key)
+
+async def get_player_guild_entry(uuid: str, api_key: str) -> Cached:
+    """Get the /v2/guild document for the guild a player is in; see ``get_guild_entry``.
+    
+    Fetching any member's guild indexes every member, so the other members of
+    the guild are then served from the same cached document.
+    
+    Args:
+        uuid (str): The player's UUID (with or without dashes)
+        api_key (str): The Hypixel API key to send
+    
+    Returns:
+        Cached: The Hypixel response, with "guild" set to None if the player has
+        no guild, with its age and cache status
+        
+    Raises:
+        HTTPException: If the API key or UUID is invalid or the API request fails
+    """
+    uuid = str(uuid).replace("-", "").lower()
+    return await _get_indexed_guild_entry(f"player:{uuid}", f"player={uuid}", api_key)
+
+async def get_player_guild(uuid: str, api_key: str) -> dict:
+    """Get the /v2/guild document for a player's guild; see ``get_player_guild_entry``."""
+    return (await get_player_guild_entry(uuid, api_key)).value
+
+async def _get_indexed_guild_entry(index_key: str, query: str, api_key: str) -> Cached:
+    key_age = await _accepted_key_age(api_key)
+    entry = await _guild_index.get(index_key) if key_age is not None else None
+    if entry is not None:
+        guild_id, fetched_at = entry
+        if guild_id != NO_GUILD:
+            guild_entry = await get_guild_entry(guild_id, api_key)
+            if guild_entry.value.get("guild"):
+                return guild_entry
+            # The indexed guild is gone; the player may be in another guild by now
+        else:
+            age = max(0.0, time.time() - fetched_at)
+            if age < config.GUILD_CACHE_TTL and key_age < config.API_KEY_CACHE_TTL:
+                return Cached({"success": True, "guild": None}, age, "hit")
+
+    data = await _inflight.do(("guild", query, api_key), _fetch_guild, query, api_key, index_key)
+    return Cached(data, 0.0, "miss")
+
+async def _fetch_guild_by_id(guild_id: str, api_key: str) -> dict:
+    data = await _fetch_guild(f"id={guild_id}", api_key)
+    if not data.get("guild"):
+        # The guild was disbanded: drop it, so its members and name are looked up afresh
+        await _forget_guild(guild_id)
+    return data
+
+async def _forget_guild(guild_id: str):
+    previous = await _guild_cache.get(guild_id)
+    await _guild_cache.delete(guild_id)
+    guild = previous[0].get("guild") if previous is not None else None
+    if not guild:
+        return
+    index_keys = [f"player:{member['uuid']}" for member in guild.get("members", []) if member.get("uuid")]
+    if guild.get("name"):
+        index_keys.append(f"name:{guild['name'].lower()}")
+    for index_key in index_keys:
+        # Leave entries already pointing at another guild
+        entry = await _guild_index.get(index_key)
+        if entry is not None and entry[0] == guild_id:
+            await _guild_index.delete(index_key)
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"https://api.hypixel.net/v2/player?key={token}&uuid={uuid}") as resp:
-            if resp.status != 200:
-                return None
-            data = await resp.json()
-            if not data.get("success", False):
-                return None
-            return data
+async def _fetch_guild(query: str, api_key: str, index_key: Optional[str] = None) -> dict:
+    data = await hypixel_get(f"/v2/guild?{query}", api_key)
+    guild = data.get("guild")
+    if not guild:
+        if index_key is not None:
+            await _guild_index.set(index_key, NO_GUILD)
+        return data
+
+    guild_id = guild["_id"].lower()
+    previous = await _guild_cache.get(guild_id)
+    await _guild_cache.set(guild_id, data)
+
+    # Point the guild's name and every member at the document, and stop
+    # pointing members who have left at it
+    members = {member["uuid"] for member in guild.get("members", []) if member.get("uuid")}
+    if previous is not None and previous[0].get("guild"):
+        for member in previous[0]["guild"].get("members", []):
+            if member.get("uuid") and member["uuid"] not in members:
+                await _guild_index.delete(f"player:{member['uuid']}")
+    for member in members:
+        await _guild_index.set(f"player:{member}", guild_id)
+    if guild.get("name"):
+        await _guild_index.set(f"name:{guild['name'].lower()}", guild_id)
+    return data
+
+async def get_user(uuid: str, token: str) -> Optional[PlayerRecord]:
+    """Get a player's PlayerRecord, or None if it cannot be fetched"""
+    try:
+        return await get_player(uuid, token)
+    except HTTPException:
+        return None
 
 
 # Bedwars Functions
 
+# Counters reported for every mode, as (output name, Hypixel stat name without the mode prefix)
+BEDWARS_COUNTERS = (
+    ("emeralds", "emerald_resources_collected_bedwars"),
+    ("diamonds", "diamond_resources_collected_bedwars"),
+    ("gold", "gold_resources_collected_bedwars"),
+    ("iron", "iron_resources_collected_bedwars"),
+    ("wins", "wins_bedwars"),
+    ("losses", "losses_bedwars"),
+    ("final_kills", "final_kills_bedwars"),
+    ("final_deaths", "final_deaths_bedwars"),
+    ("kills", "kills_bedwars"),
+    ("deaths", "deaths_bedwars"),
+    ("beds_broken", "beds_broken_bedwars"),
+    ("beds_lost", "beds_lost_bedwars"),
+)
+
+# Ratios reported for every mode, as (output name, dividend counter, divisor counter)
+BEDWARS_RATIOS = (
+    ("wlr", "wins", "losses"),
+    ("kdr", "kills", "deaths"),
+    ("fkdr", "final_kills", "final_deaths"),
+    ("bblr", "beds_broken", "beds_lost"),
+)
+
+# Modes read straight from the player's stats, by Hypixel stat prefix
+BEDWARS_MODES = {
+    "overall": "",                                   # All gamemodes
+    "eight_one": "eight_one_",                       # Solo
+    "eight_two": "eight_two_",                       # Doubles
+    "four_three": "four_three_",                     # Threes
+    "four_four": "four_four_",                       # Fours
+    "two_four": "two_four_",                         # 4v4
+    "four_four_armed": "four_four_armed_",           # Fours armed
+    "castle": "castle_",                             # Castle 40v40
+    "four_four_lucky": "four_four_lucky_",           # Fours lucky
+    "eight_two_lucky": "eight_two_lucky_",           # Doubles lucky
+    "eight_two_rush": "eight_two_rush_",             # Doubles rush
+    "four_four_rush": "four_four_rush_",             # Fours rush
+    "eight_two_swap": "eight_two_swap_",             # Doubles swap
+    "four_four_swap": "four_four_swap_",             # Fours swap
+    "eight_two_ultimate": "eight_two_ultimate_",     # Doubles ultimate
+    "four_four_ultimate": "four_four_ultimate_",     # Fours ultimate
+    "four_four_underworld": "four_four_underworld_", # Fours underworld
+    "four_four_voidless": "four_four_voidless_",     # Fours voidless
+}
+
+# Modes summed from the modes above
+BEDWARS_COMBINED_MODES = {
+    "core": ("eight_one", "eight_two", "four_three", "four_four"),
+    "ultimate": ("eight_two_ultimate", "four_four_ultimate"),
+    "lucky": ("eight_two_lucky", "four_four_lucky"),
+    "rush": ("eight_two_rush", "four_four_rush"),
+    "swap": ("eight_two_swap", "four_four_swap"),
+}
+
+# Order modes are reported in
+BEDWARS_MODE_ORDER = (
+    "overall", "core",
+    *(mode for mode in BEDWARS_MODES if mode != "overall"),
+    "ultimate", "lucky", "rush", "swap",
+)
+
+# Built once at import: the Hypixel keys read for each mode, where each mode's
+# counters sit in a player's counters, the output keys written for each mode,
+# and the counter positions used by each ratio.
+_BEDWARS_STAT_KEYS = tuple(prefix + stat for prefix in BEDWARS_MODES.values() for _, stat in BEDWARS_COUNTERS)
+_BEDWARS_MODE_SLICES = {
+    mode: slice(i * len(BEDWARS_COUNTERS), (i + 1) * len(BEDWARS_COUNTERS))
+    for i, mode in enumerate(BEDWARS_MODES)
+}
+_BEDWARS_OUTPUT_KEYS = {
+    mode: tuple(f"{mode}_{name}" for name, _ in BEDWARS_COUNTERS) + tuple(f"{mode}_{name}" for name, _, _ in BEDWARS_RATIOS)
+    for mode in BEDWARS_MODE_ORDER
+}
+_COUNTER_INDEX = {name: i for i, (name, _) in enumerate(BEDWARS_COUNTERS)}
+_BEDWARS_RATIO_INDEXES = tuple((_COUNTER_INDEX[dividend], _COUNTER_INDEX[divisor]) for _, dividend, divisor in BEDWARS_RATIOS)
+
+def read_bedwars_counters(bedwars_data: dict) -> Tuple[int, ...]:
+    """Read every ``BEDWARS_COUNTERS`` counter of every ``BEDWARS_MODES`` mode from a
+    player's ``stats.Bedwars`` section, mode after mode, 0 where missing."""
+    get = bedwars_data.get
+    return tuple(get(key, 0) for key in _BEDWARS_STAT_KEYS)
+
+def get_bedwars_stats(bedwars_counters: Sequence[int], modes: Optional[Iterable[str]] = None) -> dict:
+    """Build the per-mode Bedwars stats from a player's counters.
+    
+    Combined modes (core, ultimate, ...) are summed from the per-mode counters.
+    Only the modes asked for, and the modes they are summed from, are computed.
+    
+    Args:
+        bedwars_counters (Sequence[int]): The player's counters, from ``read_bedwars_counters``
+        modes (Iterable[str], optional): Modes to include, from ``BEDWARS_MODE_ORDER``; all by default
+    
+    Returns:
+        dict: Mode name -> stats dict keyed like ``"{mode}_wins"``, in ``BEDWARS_MODE_ORDER``
+    """
+    counters = {}
+
+    def mode_counters(mode: str) -> list:
+        values = counters.get(mode)
+        if values is None:
+            parts = BEDWARS_COMBINED_MODES.get(mode)
+            if parts is None:
+                values = list(bedwars_counters[_BEDWARS_MODE_SLICES[mode]])
+            else:
+                values = [sum(part_values) for part_values in zip(*map(mode_counters, parts))]
+            counters[mode] = values
+        return values
+
+    if modes is not None:
+        modes = set(modes)
+    stats = {}
+    for mode in BEDWARS_MODE_ORDER:
+        if modes is not None and mode not in modes:
+            continue
+        values = mode_counters(mode)
+        values = values + [
+            round(values[a] / values[b] if values[b] > 0 else float(values[a]), 2)
+            for a, b in _BEDWARS_RATIO_INDEXES
+        ]
+        stats[mode] = dict(zip(_BEDWARS_OUTPUT_KEYS[mode], values))
+    return stats
+
 class BedWarsXP:
     # Constants
     EASY_LEVELS = 4
@@ -241,11 +1125,103 @@ class BedWarsXP:
         progress = ((exp - xp_for_current_level) / (xp_for_next_level - xp_for_current_level)) * 100
         return float(round(progress, 4))  # Round to 2 decimal places
 
+# Cumulative XP needed to reach each level of a prestige, from level 0 (index 0)
+# to the next prestige (index LEVELS_PER_PRESTIGE)
+_PRESTIGE_XP_TABLE = tuple(accumulate(
+    BedWarsXP.get_exp_for_level(level) for level in range(BedWarsXP.LEVELS_PER_PRESTIGE + 1)
+))
+_EASY_LEVELS_XP_TABLE = _PRESTIGE_XP_TABLE[:BedWarsXP.EASY_LEVELS + 1]
+
+def _get_total_xp_for_level(level: int):
+    prestiges, level_in_prestige = divmod(level, BedWarsXP.LEVELS_PER_PRESTIGE)
+    return prestiges * BedWarsXP.XP_PER_PRESTIGE + _PRESTIGE_XP_TABLE[level_in_prestige]
+
 def get_level_info(exp):
-    level, prestige = BedWarsXP.calculate_star(exp)
-    xp_to_next_level = BedWarsXP.get_xp_to_next_level(exp)
-    progress_percentage = BedWarsXP.get_progress_through_level(exp)
-    return level, prestige, xp_to_next_level, progress_percentage
+    """Calculate a player's BedWars level details from their total XP.
+    
+    Gives the same results as ``BedWarsXP``, but computes everything in one pass
+    from a precomputed cumulative XP table instead of looping per level.
+    
+    Args:
+        exp (int): Total BedWars experience
+    
+    Returns:
+        tuple: (level rounded to 3 decimals, prestige, XP to the next level,
+        progress through the current level as a percentage)
+    """
+    prestiges, exp_in_prestige = divmod(exp, BedWarsXP.XP_PER_PRESTIGE)
+    easy_levels = min(bisect_right(_EASY_LEVELS_XP_TABLE, exp_in_prestige) - 1, BedWarsXP.EASY_LEVELS)
+    exp_in_level = exp_in_prestige - _EASY_LEVELS_XP_TABLE[easy_levels]
+
+    level = round(prestiges * BedWarsXP.LEVELS_PER_PRESTIGE + easy_levels + exp_in_level / BedWarsXP.XP_PER_LEVEL, 3)
+    prestige = min(level // BedWarsXP.LEVELS_PER_PRESTIGE, BedWarsXP.HIGHEST_PRESTIGE)
+
+    xp_for_current_level = _get_total_xp_for_level(int(level))
+    xp_for_next_level = _get_total_xp_for_level(int(level) + 1)
+    xp_to_next_level = max(0, xp_for_next_level - exp)
+    progress = ((exp - xp_for_current_level) / (xp_for_next_level - xp_for_current_level)) * 100
+    return level, prestige, xp_to_next_level, float(round(progress, 4))
+
+def get_network_level(exp):
+    """Calculate a player's Hypixel network level from their network XP, rounded to 2 decimals."""
+    return round((math.sqrt((2 * exp) + 30625) / 50) - 2.5, 2)
+
+_PRESTIGE_XP_ARRAY = np.array(_PRESTIGE_XP_TABLE)
+_EASY_LEVELS_XP_ARRAY = np.array(_EASY_LEVELS_XP_TABLE)
+
+def _round(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """Round like Python's ``round()``.
+    
+    ``np.round`` scales by ``10 ** ndigits`` in floating point, which can land on
+    the other side of a .5 tie than Python's exact rounding. The few values that
+    are that close to a tie are rounded with ``round()`` instead.
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * 10 ** ndigits
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+def _as_xp_array(exps) -> np.ndarray:
+    exps = np.asarray(exps)
+    if exps.dtype.kind not in "iuf":
+        exps = exps.astype(np.float64)
+    return exps
+
+def _get_total_xp_for_levels(levels: np.ndarray) -> np.ndarray:
+    prestiges, levels_in_prestige = np.divmod(levels, BedWarsXP.LEVELS_PER_PRESTIGE)
+    return prestiges * BedWarsXP.XP_PER_PRESTIGE + _PRESTIGE_XP_ARRAY[levels_in_prestige]
+
+def get_level_info_batch(exps):
+    """Calculate BedWars level details for many players at once with NumPy.
+    
+    Element for element, the results equal ``get_level_info``.
+    
+    Args:
+        exps (array-like): Total BedWars experience per player
+    
+    Returns:
+        tuple: Arrays of (level, prestige, XP to the next level, progress percentage)
+    """
+    exps = _as_xp_array(exps)
+    prestiges, exp_in_prestige = np.divmod(exps, BedWarsXP.XP_PER_PRESTIGE)
+    easy_levels = np.minimum(np.searchsorted(_EASY_LEVELS_XP_ARRAY, exp_in_prestige, side="right") - 1, BedWarsXP.EASY_LEVELS)
+    exp_in_level = exp_in_prestige - _EASY_LEVELS_XP_ARRAY[easy_levels]
+
+    levels = _round(prestiges * BedWarsXP.LEVELS_PER_PRESTIGE + easy_levels + exp_in_level / BedWarsXP.XP_PER_LEVEL, 3)
+    prestiges = np.minimum(levels // BedWarsXP.LEVELS_PER_PRESTIGE, BedWarsXP.HIGHEST_PRESTIGE)
+
+    whole_levels = levels.astype(np.int64)
+    xp_for_current_level = _get_total_xp_for_levels(whole_levels)
+    xp_for_next_level = _get_total_xp_for_levels(whole_levels + 1)
+    xp_to_next_level = np.maximum(0, xp_for_next_level - exps)
+    progress = ((exps - xp_for_current_level) / (xp_for_next_level - xp_for_current_level)) * 100
+    return levels, prestiges, xp_to_next_level, _round(progress, 4)
+
+def get_network_level_batch(exps) -> np.ndarray:
+    """Calculate network levels for many players at once; equals ``get_network_level`` element for element."""
+    exps = _as_xp_array(exps)
+    return _round((np.sqrt((2 * exps) + 30625) / 50) - 2.5, 2)
 
 
 
@@ -253,12 +1229,7 @@ def get_level_info(exp):
 
 async def fetch_xp(uuid: str, token: str):
     uuid = uuid.strip("-")
-    data = await get_user(uuid, token)
-    # if not data or "player" not in data:
-    #     return None
-
-    try:
-        xp = data["player"]["stats"]["BedWars"]["Experience"]
-        return xp
-    except KeyError:
+    record = await get_user(uuid, token)
+    if record is None:
         return None
+    return record.bedwars_xp
@@ -0,0 +1,57 @@
+import random
+
+import numpy as np
+import pytest
+
+from utils import (
+    BedWarsXP,
+    get_level_info,
+    get_level_info_batch,
+    get_network_level,
+    get_network_level_batch,
+)
+
+XP_PER_PRESTIGE = BedWarsXP.XP_PER_PRESTIGE
+
+rng = random.Random(20241018)
+
+# Levels repeat every prestige, so every XP value through the first levels and
+# around every prestige boundary up to past the highest prestige covers each
+# branch; random integers and fractional XP cover the rest
+DENSE_XP = sorted(set(range(0, 60_001)).union(*(
+    range(prestige * XP_PER_PRESTIGE - 3_000, prestige * XP_PER_PRESTIGE + 3_000)
+    for prestige in range(1, BedWarsXP.HIGHEST_PRESTIGE + 2)
+)))
+RANDOM_XP = [rng.randint(0, 10 ** 9) for _ in range(10_000)] + [rng.uniform(0, 5 * 10 ** 6) for _ in range(10_000)]
+# Half an XP puts many levels exactly on a rounding tie, where np.round and round() disagree
+TIE_XP = [exp + 0.5 for exp in range(0, 20_000)]
+ALL_XP = DENSE_XP + RANDOM_XP + TIE_XP
+
+
+def reference_level_info(exp):
+    level, prestige = BedWarsXP.calculate_star(exp)
+    return level, prestige, BedWarsXP.get_xp_to_next_level(exp), BedWarsXP.get_progress_through_level(exp)
+
+
+@pytest.mark.parametrize("xps", [DENSE_XP, RANDOM_XP, TIE_XP], ids=["dense", "random", "ties"])
+def test_level_info_matches_bedwars_xp(xps):
+    for exp in xps:
+        expected = reference_level_info(exp)
+        actual = get_level_info(exp)
+        assert actual == expected, exp
+        assert [type(value) for value in actual] == [type(value) for value in expected], exp
+
+
+@pytest.mark.parametrize("dtype", [np.int64, np.float64])
+def test_level_info_batch_matches_scalar(dtype):
+    xps = np.array([exp for exp in ALL_XP if dtype is np.float64 or isinstance(exp, int)], dtype=dtype)
+    batch = get_level_info_batch(xps)
+    for i, exp in enumerate(xps.tolist()):
+        assert tuple(column[i] for column in batch) == get_level_info(exp), exp
+
+
+def test_network_level_batch_matches_scalar():
+    xps = list(range(0, 2_000_000, 7)) + [rng.uniform(0, 10 ** 8) for _ in range(50_000)]
+    batch = get_network_level_batch(xps)
+    for exp, level in zip(xps, batch.tolist()):
+        assert level == get_network_level(exp), exp